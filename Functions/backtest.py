@@ -0,0 +1,98 @@
+import numpy as np
+
+__all__ = ['rls_backtest']
+
+
+def _design(data, response_var, predictor_vars, add_constant):
+    """Return the response vector and design matrix as float arrays"""
+    if predictor_vars is None:
+        predictor_vars = [col for col in data.columns if col != response_var]
+
+    y = data[response_var].to_numpy(dtype=np.float64)
+    X = data[predictor_vars].to_numpy(dtype=np.float64)
+    names = list(predictor_vars)
+    if add_constant:
+        X = np.column_stack([np.ones(len(X)), X])
+        names = ['const'] + names
+    return y, X, names
+
+
+def _rls_add(P, beta, rss, x, y):
+    """Sherman-Morrison update of (X'X)^-1, coefficients and RSS with one new row"""
+    Px = P @ x
+    denom = 1.0 + x @ Px
+    error = y - x @ beta
+    gain = Px / denom
+    beta = beta + gain * error
+    P = P - np.outer(gain, Px)
+    rss = rss + error ** 2 / denom
+    return P, beta, rss
+
+
+def _rls_drop(P, beta, rss, x, y):
+    """Sherman-Morrison downdate of (X'X)^-1, coefficients and RSS removing one row"""
+    Px = P @ x
+    denom = 1.0 - x @ Px
+    residual = y - x @ beta
+    P = P + np.outer(Px, Px) / denom
+    beta = beta - Px * residual / denom
+    rss = rss - residual ** 2 / denom
+    return P, beta, rss
+
+
+def rls_backtest(data, response_var='D_CLOSE', predictor_vars=None, window=None,
+                 min_obs=None, add_constant=True):
+    """
+    Walk-forward OLS backtest with recursive least squares updates
+    window=None uses an expanding window starting from min_obs observations,
+    an integer a rolling window of that length.
+    At every step the model estimated on past observations forecasts the next one,
+    then the new observation is added (and the oldest dropped for rolling windows)
+    with rank-one updates instead of a refit.
+    Returns bulk arrays: coefficient path, residual variance, forecasts and errors
+    """
+    y, X, names = _design(data, response_var, predictor_vars, add_constant)
+    n, p = X.shape
+
+    if window is not None and window <= p:
+        raise ValueError(f"Rolling window must exceed the number of parameters ({p})")
+    if window is not None:
+        min_obs = window
+    elif min_obs is None:
+        min_obs = max(2 * p, p + 2)
+    if min_obs <= p or min_obs >= n:
+        raise ValueError(f"Initial window of {min_obs} observations is not valid for n={n}, p={p}")
+
+    X0 = X[:min_obs]
+    y0 = y[:min_obs]
+    P = np.linalg.inv(X0.T @ X0)
+    beta = P @ (X0.T @ y0)
+    resid0 = y0 - X0 @ beta
+    rss = resid0 @ resid0
+
+    n_steps = n - min_obs
+    coefficients = np.empty((n_steps, p))
+    sigma2 = np.empty(n_steps)
+    forecasts = np.empty(n_steps)
+
+    for step, t in enumerate(range(min_obs, n)):
+        n_window = window if window is not None else t
+        coefficients[step] = beta
+        sigma2[step] = rss / (n_window - p)
+        forecasts[step] = X[t] @ beta
+
+        P, beta, rss = _rls_add(P, beta, rss, X[t], y[t])
+        if window is not None:
+            old = t - window
+            P, beta, rss = _rls_drop(P, beta, rss, X[old], y[old])
+
+    actuals = y[min_obs:]
+    return {
+        'index': data.index[min_obs:],
+        'names': names,
+        'coefficients': coefficients,
+        'sigma2': sigma2,
+        'forecasts': forecasts,
+        'actuals': actuals,
+        'errors': actuals - forecasts,
+    }
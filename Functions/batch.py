@@ -0,0 +1,102 @@
+import json
+import logging
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from Functions.data_preparation import load_prepared_data
+from Functions.instrumentation import logger
+from Functions.pipeline import prune_stage_cache, run_pipeline
+
+__all__ = ['BATCH_JOB_DEFAULTS', 'load_jobs', 'normalize_job', 'run_batch']
+
+# Defaults for batch jobs: no figures, no shared incremental state, one core per job, and
+# no cache pruning while sibling jobs may still read their entries (run_batch prunes once at the end)
+BATCH_JOB_DEFAULTS = {
+    'plots': False,
+    'save_state': False,
+    'n_jobs': 1,
+    'prune_cache': False,
+}
+
+
+def load_jobs(path):
+    """Read a JSON list of jobs: {"name", "dataset", "target", "config"}"""
+    with open(path) as f:
+        jobs = json.load(f)
+    return [normalize_job(job, i) for i, job in enumerate(jobs)]
+
+
+def normalize_job(job, index=0):
+    """Accept (dataset, target, config) tuples or dicts and fill in a job name"""
+    if not isinstance(job, dict):
+        dataset, target, config = (list(job) + [None])[:3]
+        job = {'dataset': dataset, 'target': target, 'config': config}
+    job = {'config': {}, **job}
+    job['config'] = job['config'] or {}
+    job.setdefault('name', f"{index}:{os.path.basename(job['dataset'])}:{job['target']}")
+    return job
+
+
+def _run_job(job, log_level):
+    """Run one pipeline job in a worker; failures are returned, not raised"""
+    logger.setLevel(log_level)
+    config = {**BATCH_JOB_DEFAULTS, **job['config'], 'data_path': job['dataset'], 'y_name': job['target']}
+    started = time.perf_counter()
+    row = {'job': job['name'], 'dataset': job['dataset'], 'target': job['target']}
+    try:
+        artifacts = run_pipeline(config)
+        model = artifacts['model']
+        row.update({
+            'status': 'ok',
+            'variables': ', '.join(artifacts['best_vars']),
+            'r2': model.rsquared,
+            'adj_r2': model.rsquared_adj,
+            'aic': model.aic,
+            'bic': model.bic,
+            **artifacts['metrics'],
+            'error': None,
+        })
+    except Exception as e:
+        row.update({'status': 'failed', 'error': f"{type(e).__name__}: {e}",
+                    'traceback': traceback.format_exc()})
+    row['wall_s'] = time.perf_counter() - started
+    return row
+
+
+def run_batch(jobs, max_workers=None, log_level=logging.WARNING):
+    """
+    Run the full pipeline for many (dataset, target, config) jobs in a process pool
+    Each distinct dataset is parsed once up front so jobs share the cached
+    preprocessed input; a failing job is reported in its row without stopping
+    the others. Returns one comparison table with a row per job
+    """
+    jobs = [normalize_job(job, i) for i, job in enumerate(jobs)]
+    for dataset in sorted({job['dataset'] for job in jobs if job['config'].get('data_cache', True)}):
+        try:
+            load_prepared_data(dataset)
+        except Exception as e:
+            logger.warning(f"Could not preload {dataset}: {e}")
+
+    max_workers = min(max_workers or os.cpu_count() or 1, len(jobs)) or 1
+    logger.info(f"Running {len(jobs)} jobs on {max_workers} workers")
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_run_job, job, log_level) for job in jobs]
+        rows = []
+        for job, future in zip(jobs, futures):
+            try:
+                row = future.result()
+            except Exception as e:  # worker crashed
+                row = {'job': job['name'], 'dataset': job['dataset'], 'target': job['target'],
+                       'status': 'failed', 'error': f"{type(e).__name__}: {e}"}
+            logger.info(f"{row['job']}: {row['status']}" + (f" ({row['error']})" if row.get('error') else ""))
+            if row.get('traceback'):
+                logger.debug(row['traceback'])
+            rows.append(row)
+
+    prune_stage_cache()
+    table = pd.DataFrame(rows)
+    if 'traceback' in table.columns:
+        table = table.drop(columns=['traceback'])
+    return table
@@ -0,0 +1,163 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+__all__ = ['CANDIDATE_REPORT_PATH', 'DIAGNOSTIC_CHECKS', 'diagnose_candidates', 'write_candidate_report']
+
+CANDIDATE_REPORT_PATH = Path("candidate_report.md")
+
+# Assumption checks of the ranking: name -> pass condition on a DiagnosticsResult (5% level)
+DIAGNOSTIC_CHECKS = {
+    'normality': lambda d: d.shapiro_pvalue >= 0.05 and d.jb_pvalue >= 0.05,
+    'autocorrelation': lambda d: 1.5 <= d.dw_stat <= 2.5 and d.lb_pvalue > 0.05 and d.bg_pvalue > 0.05,
+    'heteroskedasticity': lambda d: d.bp_pvalue > 0.05 and d.gq_pvalue > 0.05,
+    'multicollinearity': lambda d: d.max_vif < 5,
+}
+
+FIT_LABELS = {'r2': 'R²', 'adj_r2': 'Adj. R²', 'aic': 'AIC', 'bic': 'BIC', 'rmse_test': 'Test RMSE'}
+
+# Training and test data shared with pool workers, set once per process by _init_worker
+_SHARED = {}
+
+
+def _init_worker(data, response_var, data_test):
+    """Store the model data in the worker process"""
+    _SHARED.update(data=data, response_var=response_var, data_test=data_test)
+
+
+def _diagnose_candidate(var_list):
+    """Fit one candidate and run its diagnostics; returns a report row"""
+    import statsmodels.api as sm
+    from Functions.tests import run_diagnostics
+
+    data, response_var, data_test = _SHARED['data'], _SHARED['response_var'], _SHARED['data_test']
+    model = sm.OLS(data[response_var], sm.add_constant(data[var_list])).fit()
+    diagnostics = run_diagnostics(model)
+
+    row = {'variables': ', '.join(var_list) or 'const', 'n_vars': len(var_list),
+           'r2': model.rsquared, 'adj_r2': model.rsquared_adj, 'aic': model.aic, 'bic': model.bic}
+    if data_test is not None:
+        predictions = model.predict(sm.add_constant(data_test[var_list], has_constant='add'))
+        row['rmse_test'] = float(np.sqrt(np.mean((data_test[response_var] - predictions) ** 2)))
+    checks = {name: bool(check(diagnostics)) for name, check in DIAGNOSTIC_CHECKS.items()}
+    row.update(checks)
+    row['tests_passed'] = sum(checks.values())
+    row['diagnostics'] = diagnostics
+    row['parameters'] = pd.DataFrame({'coef': model.params, 'std_err': model.bse,
+                                      't': model.tvalues, 'p_value': model.pvalues})
+    return row
+
+
+def _diagnose_chunk(var_lists):
+    return [_diagnose_candidate(var_list) for var_list in var_lists]
+
+
+def diagnose_candidates(data, candidates, response_var='D_CLOSE', data_test=None, sort_by='aic', max_workers=None):
+    """
+    Fit and diagnose many candidate models in a process pool
+    candidates are variable lists or Hellwig/stepwise result dicts. Each model gets
+    normality, autocorrelation, heteroskedasticity and VIF checks; models are ranked
+    by the number of checks passed, then by sort_by ('aic', 'bic', 'rmse_test' lower
+    is better, 'r2'/'adj_r2' higher). Candidates are split into one chunk per worker,
+    so data is sent to each worker once
+    """
+    var_lists = [list(c['var_list']) if isinstance(c, dict) else list(c) for c in candidates]
+    columns = [response_var] + sorted({var for var_list in var_lists for var in var_list})
+    data = data[columns]
+    data_test = None if data_test is None else data_test[columns]
+
+    max_workers = min(max_workers or os.cpu_count() or 1, len(var_lists)) or 1
+    chunks = [var_lists[i::max_workers] for i in range(max_workers)]
+    if max_workers == 1:
+        _init_worker(data, response_var, data_test)
+        results = [_diagnose_chunk(chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(data, response_var, data_test)) as executor:
+            results = list(executor.map(_diagnose_chunk, chunks))
+
+    table = pd.DataFrame([row for rows in results for row in rows])
+    ascending = sort_by not in ('r2', 'adj_r2')
+    table = table.sort_values(['tests_passed', sort_by], ascending=[False, ascending], kind='stable')
+    table.insert(0, 'rank', np.arange(1, len(table) + 1))
+    return table.reset_index(drop=True)
+
+
+def _markdown_table(header, rows):
+    lines = ["| " + " | ".join(header) + " |", "|" + "|".join("-" * (len(h) + 2) for h in header) + "|"]
+    lines += ["| " + " | ".join(str(cell) for cell in row) + " |" for row in rows]
+    return "\n".join(lines)
+
+
+def _significance(p_value):
+    return "***" if p_value < 0.001 else "**" if p_value < 0.01 else "*" if p_value < 0.05 else ""
+
+
+def _diagnostics_rows(d):
+    """Assumption testing rows in the layout of raport.md"""
+    def verdict(passed, ok, bad):
+        return ok if passed else bad
+    return [
+        ("**Normality**", "", "", ""),
+        ("Shapiro-Wilk", f"W = {d.shapiro_stat:.4f}", f"{d.shapiro_pvalue:.4f}",
+         verdict(d.shapiro_pvalue >= 0.05, "Normal", "Reject H₀ - Non-normal")),
+        ("Jarque-Bera", f"JB = {d.jb_stat:.2f}", f"{d.jb_pvalue:.4f}",
+         verdict(d.jb_pvalue >= 0.05, "Normal", "Reject H₀ - Non-normal")),
+        ("**Autocorrelation**", "", "", ""),
+        ("Durbin-Watson", f"DW = {d.dw_stat:.3f}", "-",
+         verdict(1.5 <= d.dw_stat <= 2.5, "No autocorrelation", "Suspected autocorrelation")),
+        ("Ljung-Box", f"LB = {d.lb_stat:.3f}", f"{d.lb_pvalue:.4f}",
+         verdict(d.lb_pvalue > 0.05, "No autocorrelation", "Autocorrelation")),
+        ("Breusch-Godfrey", f"LM = {d.bg_stat:.3f}", f"{d.bg_pvalue:.4f}",
+         verdict(d.bg_pvalue > 0.05, "No autocorrelation", "Autocorrelation")),
+        ("**Heteroskedasticity**", "", "", ""),
+        ("Breusch-Pagan", f"BP = {d.bp_stat:.3f}", f"{d.bp_pvalue:.4f}",
+         verdict(d.bp_pvalue > 0.05, "Homoskedastic", "Heteroskedastic")),
+        ("Goldfeld-Quandt", f"GQ = {d.gq_stat:.3f}", f"{d.gq_pvalue:.4f}",
+         verdict(d.gq_pvalue > 0.05, "Homoskedastic", "Heteroskedastic")),
+        ("**Multicollinearity**", "", "", ""),
+        ("Max VIF", f"{d.max_vif:.3f}", "-", verdict(d.max_vif < 5, "No issues", "Multicollinearity")),
+    ]
+
+
+def write_candidate_report(table, path=CANDIDATE_REPORT_PATH, response_var='D_CLOSE'):
+    """
+    Write a diagnose_candidates table as a Markdown report (in the style of raport.md)
+    and as a CSV with the same stem; returns the two paths
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    checks = list(DIAGNOSTIC_CHECKS)
+    fit_columns = [c for c in FIT_LABELS if c in table.columns]
+
+    lines = ["# Candidate Model Report", "",
+             f"Dependent variable: **{response_var}**. {len(table)} candidate models ranked by the number "
+             f"of passed assumption checks ({', '.join(checks)}; 5% level), then by fit.", "",
+             "## Ranking", ""]
+    header = ["Rank", "Variables", "Passed"] + [FIT_LABELS[c] for c in fit_columns]
+    rows = []
+    for _, row in table.iterrows():
+        rows.append([row['rank'], row['variables'], f"{row['tests_passed']}/{len(checks)}"]
+                    + [f"{row[c]:.4f}" for c in fit_columns])
+    lines += [_markdown_table(header, rows), "", "## Models", ""]
+
+    for _, row in table.iterrows():
+        lines += [f"### {row['rank']}. {row['variables']}", "", "**Parameter Estimates:**", ""]
+        parameters = [(name, f"{p['coef']:.6f}", f"{p['std_err']:.3f}", f"{p['t']:.3f}", f"{p['p_value']:.4f}",
+                       _significance(p['p_value'])) for name, p in row['parameters'].iterrows()]
+        lines += [_markdown_table(["Parameter", "Coefficient", "Std. Error", "t-statistic", "p-value",
+                                   "Significance"], parameters), ""]
+        tests = _diagnostics_rows(row['diagnostics'])
+        lines += ["**Assumption Testing Results:**", "",
+                  _markdown_table(["Test", "Statistic", "p-value", "Conclusion"], tests), ""]
+    path.write_text("\n".join(lines))
+
+    csv_path = path.with_suffix('.csv')
+    diagnostics = pd.DataFrame([{k: v for k, v in asdict(d).items() if k != 'vif'} | {'max_vif': d.max_vif}
+                                for d in table['diagnostics']])
+    flat = pd.concat([table.drop(columns=['diagnostics', 'parameters']).reset_index(drop=True), diagnostics], axis=1)
+    flat.to_csv(csv_path, index=False)
+    return path, csv_path
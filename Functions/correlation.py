@@ -0,0 +1,100 @@
+import hashlib
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+__all__ = ['CORRELATION_CACHE_SIZE', 'correlation_matrix', 'correlation_submatrix', 'clear_correlation_cache']
+
+CORRELATION_CACHE_SIZE = 32
+
+# (frame fingerprint, method) -> (column hashes, correlation matrix), least recently used first
+_CORRELATION_CACHE = OrderedDict()
+
+
+def _column_hash(values):
+    """Content hash of one column's values"""
+    values = np.ascontiguousarray(values, dtype=np.float64)
+    return hashlib.sha1(values.tobytes()).hexdigest()
+
+
+def _pearson(X):
+    """
+    Pearson correlation matrix of the columns of a 2-D float array
+    Complete data is standardized and multiplied once; with missing values
+    pairwise-complete moments come from a handful of masked products
+    """
+    mask = ~np.isnan(X)
+    if mask.all():
+        Z = X - X.mean(axis=0)
+        norms = np.sqrt(np.einsum('ij,ij->j', Z, Z))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            Z = Z / norms
+        corr = Z.T @ Z
+    else:
+        M = mask.astype(np.float64)
+        X0 = np.where(mask, X, 0.0)
+        n = M.T @ M
+        sx = X0.T @ M  # sum of column i over rows where j is also present
+        sxx = (X0 * X0).T @ M
+        sxy = X0.T @ X0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cov = n * sxy - sx * sx.T
+            var = n * sxx - sx * sx
+            corr = cov / np.sqrt(var * var.T)
+        corr[n < 2] = np.nan
+    corr = np.clip(corr, -1.0, 1.0)
+    np.fill_diagonal(corr, np.where(np.isnan(np.diag(corr)), np.nan, 1.0))
+    return corr
+
+
+def _compute(data, method):
+    """Correlation matrix for a numeric frame"""
+    X = data.to_numpy(dtype=np.float64)
+    if method == 'spearman':
+        # Ranks are taken per column, which matches pandas when data is complete
+        X = data.rank().to_numpy(dtype=np.float64)
+    elif method != 'pearson':
+        raise ValueError(f"Unsupported correlation method: {method}")
+    return _pearson(X)
+
+
+def correlation_matrix(data, method='pearson'):
+    """
+    Memoized correlation matrix of a DataFrame
+    Results are cached per (frame fingerprint, method); a frame whose columns
+    are all contained in a cached frame is served as a submatrix of it
+    """
+    hashes = [_column_hash(data[col].to_numpy()) for col in data.columns]
+    fingerprint = hashlib.sha1((''.join(hashes) + '|' + '|'.join(map(str, data.columns))).encode()).hexdigest()
+    key = (fingerprint, method)
+
+    if key in _CORRELATION_CACHE:
+        _CORRELATION_CACHE.move_to_end(key)
+        _, corr = _CORRELATION_CACHE[key]
+        return pd.DataFrame(corr, index=data.columns, columns=data.columns)
+
+    for (_, cached_method), (cached_hashes, cached_corr) in reversed(_CORRELATION_CACHE.items()):
+        if cached_method != method:
+            continue
+        position = {h: i for i, h in enumerate(cached_hashes)}
+        if all(h in position for h in hashes):
+            idx = [position[h] for h in hashes]
+            corr = cached_corr[np.ix_(idx, idx)]
+            break
+    else:
+        corr = _compute(data, method)
+
+    _CORRELATION_CACHE[key] = (hashes, corr)
+    while len(_CORRELATION_CACHE) > CORRELATION_CACHE_SIZE:
+        _CORRELATION_CACHE.popitem(last=False)
+    return pd.DataFrame(corr, index=data.columns, columns=data.columns)
+
+
+def correlation_submatrix(data, rows, columns, method='pearson'):
+    """Correlations between the given row and column variables of data"""
+    return correlation_matrix(data, method).loc[rows, columns]
+
+
+def clear_correlation_cache():
+    """Drop all memoized correlation matrices"""
+    _CORRELATION_CACHE.clear()
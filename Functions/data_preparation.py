@@ -1,6 +1,28 @@
+import hashlib
+import json
+import os
 import re
+import tempfile
+from pathlib import Path
 import pandas as pd
 import numpy as np
+from Functions.correlation import correlation_matrix
+
+__all__ = ['DATA_CACHE_DIR', 'sanitize_name', 'sanitize_columns', 'read_excel_data', 'data_file_key',
+           'load_prepared_data', 'load_and_prepare_data', 'filter_by_correlation_with_y',
+           'remove_inflation_variable', 'log_transform', 'remove_low_variance_variables', 'interpolate_block',
+           'load_prepared_block', 'log_transform_block', 'difference_block', 'log_transform_compact',
+           'difference_compact']
+
+DATA_CACHE_DIR = Path(".cache") / "data"
+
+# Parameters of the cached preprocessing; changing them invalidates the cache
+_PREPARATION_PARAMS = {
+    'drop_leading_columns': 1,
+    'sanitize_names': True,
+    'interpolation': 'linear',
+    'limit_direction': 'both',
+}
 
 def sanitize_name(name):
     """Clean variable names for safe processing"""
@@ -16,20 +38,170 @@ def sanitize_columns(df):
     return df
 
 
-def load_and_prepare_data(filepath):
-    """Load data and split into training/test sets"""
+def read_excel_data(filepath):
+    """Parse the Excel input, sanitize names and interpolate missing values"""
     data = pd.read_excel(filepath)
     data = data.iloc[:, 1:].copy()  # Remove first column (date)
     data = sanitize_columns(data)
-    alpha = 0.05
 
     # Linear interpolation for missing values
     for col in data.columns:
         data[col] = data[col].interpolate(method='linear', limit_direction='both')
+    return data
+
+
+def data_file_key(filepath):
+    """Hash of the source file contents, its mtime and the preprocessing parameters"""
+    h = hashlib.sha256()
+    buffer = bytearray(1 << 16)
+    view = memoryview(buffer)
+    with open(filepath, 'rb') as f:
+        while True:
+            size = f.readinto(buffer)
+            if not size:
+                break
+            h.update(view[:size])
+    h.update(str(os.stat(filepath).st_mtime_ns).encode())
+    h.update(json.dumps(_PREPARATION_PARAMS, sort_keys=True).encode())
+    return h.hexdigest()[:32]
+
+
+def _read_cached_data(cache_path):
+    """Load a cached frame from its .npy block and column index, or None if absent"""
+    try:
+        meta = json.loads(cache_path.with_suffix('.json').read_text())
+        block = np.load(cache_path, mmap_mode='r')
+    except FileNotFoundError:
+        return None
+    data = pd.DataFrame(np.array(block), columns=meta['columns'])
+    return data.astype(dict(zip(meta['columns'], meta['dtypes'])))
+
+
+def _replace_atomically(path, write):
+    """Write a file through a per-process temporary name in the same directory, then rename it"""
+    with tempfile.NamedTemporaryFile(dir=path.parent, prefix=f".{path.name}.", suffix='.tmp', delete=False) as f:
+        tmp_path = Path(f.name)
+        try:
+            write(f)
+        except BaseException:
+            f.close()
+            tmp_path.unlink(missing_ok=True)
+            raise
+    os.replace(tmp_path, path)
+
+
+def _write_cached_block(block, columns, dtypes, cache_path):
+    """
+    Store a 2-D float block as a memory-mappable .npy file plus a JSON column index
+    Both are written atomically, the index first, so the .npy file only appears once
+    its index is in place; concurrent writers never share a temporary file
+    """
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    stem = cache_path.stem.rsplit('-', 1)[0]
+    for stale in cache_path.parent.glob(f"{stem}-{'[0-9a-f]' * 32}.*"):
+        if not stale.name.startswith(cache_path.stem):
+            stale.unlink(missing_ok=True)
+
+    meta = {'columns': list(columns), 'dtypes': [str(t) for t in dtypes]}
+    _replace_atomically(cache_path.with_suffix('.json'), lambda f: f.write(json.dumps(meta).encode()))
+    _replace_atomically(cache_path, lambda f: np.save(f, np.asarray(block, dtype=np.float64)))
+
+
+def _write_cached_data(data, cache_path):
+    """Store a numeric frame as a memory-mappable .npy block plus a JSON column index"""
+    _write_cached_block(data.to_numpy(dtype=np.float64), data.columns, data.dtypes, cache_path)
+
+
+def load_prepared_data(filepath, use_cache=True, cache_dir=DATA_CACHE_DIR):
+    """
+    Return the sanitized, interpolated input frame
+    Parsed data is cached in a binary columnar format keyed on the source
+    file and preprocessing parameters, so warm starts skip Excel parsing
+    """
+    if not use_cache:
+        return read_excel_data(filepath)
+
+    cache_path = Path(cache_dir) / f"{Path(filepath).stem}-{data_file_key(filepath)}.npy"
+    data = _read_cached_data(cache_path)
+    if data is None:
+        data = read_excel_data(filepath)
+        if all(pd.api.types.is_numeric_dtype(t) for t in data.dtypes):
+            _write_cached_data(data, cache_path)
+    return data
+
+
+def interpolate_block(block):
+    """
+    Linear interpolation of missing values down every column of a 2-D float block, in place
+    Matches Series.interpolate(method='linear', limit_direction='both'): leading and
+    trailing gaps take the nearest valid value, all-missing columns stay missing
+    """
+    missing = np.isnan(block)
+    columns = np.flatnonzero(missing.any(axis=0))
+    if len(columns) == 0:
+        return block
+
+    n = len(block)
+    index_dtype = np.int32 if n < 2 ** 31 else np.int64
+    rows = np.arange(n, dtype=index_dtype)[:, None]
+    missing = missing[:, columns]
+    previous = np.where(missing, -1, rows)
+    np.maximum.accumulate(previous, axis=0, out=previous)
+    following = np.where(missing, n, rows)
+    np.minimum.accumulate(following[::-1], axis=0, out=following[::-1])
+
+    r, c = np.nonzero(missing)
+    p, q = previous[r, c], following[r, c]
+    col = columns[c]
+    has_p, has_q = p >= 0, q < n
+    left = block[np.where(has_p, p, q).clip(0, n - 1), col]
+    right = block[np.where(has_q, q, p).clip(0, n - 1), col]
+    weight = np.where(has_p & has_q, (r - p) / np.maximum(q - p, 1), 0.0)
+    block[r, col] = left + (right - left) * weight
+    return block
+
+
+def load_prepared_block(filepath, dtype=np.float64, use_cache=True, cache_dir=DATA_CACHE_DIR):
+    """
+    Return the sanitized, interpolated input as one 2-D NumPy block and its column names
+    The cached .npy file is memory-mapped and converted to dtype in a single copy;
+    a cold read interpolates the parsed values in place
+    """
+    cache_path = Path(cache_dir) / f"{Path(filepath).stem}-{data_file_key(filepath)}.npy"
+    if use_cache:
+        try:
+            columns = json.loads(cache_path.with_suffix('.json').read_text())['columns']
+            return np.array(np.load(cache_path, mmap_mode='r'), dtype=dtype), columns
+        except FileNotFoundError:
+            pass
+
+    raw = pd.read_excel(filepath)
+    columns = [sanitize_name(c) for c in raw.columns[1:]]  # first column is the date
+    block = interpolate_block(raw.iloc[:, 1:].to_numpy(dtype=np.float64))
+    del raw
+    if use_cache:
+        _write_cached_block(block, columns, [np.dtype(np.float64)] * len(columns), cache_path)
+    return (block if block.dtype == dtype else block.astype(dtype)), columns
+
+
+def load_and_prepare_data(filepath, use_cache=True, dtype=None):
+    """
+    Load data and split into training/test sets
+    With dtype (e.g. np.float32) both sets are row slices of a single NumPy block
+    instead of separate copies; pandas copy-on-write copies a set only when it is modified
+    """
+    alpha = 0.05
+    if dtype is None:
+        data = load_prepared_data(filepath, use_cache=use_cache)
+    else:
+        block, columns = load_prepared_block(filepath, dtype, use_cache=use_cache)
+        data = pd.DataFrame(block, columns=columns, copy=False)
 
     # 80/20 train-test split
     n = len(data)
     train_size = int(np.floor(0.8 * n))
+    if dtype is not None:
+        return data.iloc[:train_size], data.iloc[train_size:], alpha
     data_learning = data.iloc[:train_size].copy()
     data_test = data.iloc[train_size:].copy()
     return data_learning, data_test, alpha
@@ -42,11 +214,12 @@ def filter_by_correlation_with_y(data, y_name="CLOSE", low_thr=0.3, high_thr=0.7
 
     explanatory_vars = [col for col in data.columns if col != y_name]
     to_remove = []
+    correlations = correlation_matrix(data)[y_name]
 
     print(f"Checking correlations with {y_name} (threshold: |r| ∈ [{low_thr}, {high_thr}]):")
 
     for var in explanatory_vars:
-        r = abs(data[var].corr(data[y_name]))
+        r = abs(correlations[var])
 
         if r > high_thr or r < low_thr:
             to_remove.append(var)
@@ -90,6 +263,67 @@ def log_transform(df):
     return result
 
 
+def log_transform_block(block):
+    """
+    In-place counterpart of log_transform for a 2-D float block
+    Non-positive values are interpolated over, rows that stay missing are dropped
+    (the only copy), and the log is taken in place. Returns the block and the
+    boolean mask of kept rows
+    """
+    nonpositive = block <= 0
+    if nonpositive.any():
+        print(f"Warning: {nonpositive.any(axis=1).sum()} rows contain values <= 0")
+        block[nonpositive] = np.nan
+        interpolate_block(block)
+    del nonpositive
+
+    keep = ~np.isnan(block).any(axis=1)
+    if not keep.all():
+        block = block[keep]
+    np.log(block, out=block)
+    print("Data successfully log-transformed")
+    return block, keep
+
+
+def difference_block(block, orders, chunk_rows=4096):
+    """
+    Lag differences x[t] - x[t - order] per column of a 2-D float block, in place
+    orders gives one differencing order per column (0 leaves the column unchanged).
+    Rows are processed bottom-up in chunks so no full-size temporary is allocated.
+    Returns a view without the first max(orders) rows, as dropna() does on the frame path
+    """
+    orders = np.asarray(orders)
+    n = len(block)
+    for order in np.unique(orders[orders > 0]):
+        columns = orders == order
+        for start in range(n, order, -chunk_rows):
+            stop, start = start, max(start - chunk_rows, order)
+            np.subtract(block[start:stop], block[start - order:stop - order],
+                        out=block[start:stop], where=columns)
+    return block[orders.max(initial=0):]
+
+
+def log_transform_compact(df):
+    """log_transform on one copy of the frame's values (in its dtype), transformed in place"""
+    block, keep = log_transform_block(df.to_numpy(copy=True))
+    return pd.DataFrame(block, index=df.index[keep], columns=df.columns, copy=False)
+
+
+def difference_compact(df, diff_info):
+    """
+    apply_diff_to_test_data on one copy of the frame's values, differenced in place
+    by difference_block; columns follow diff_info as on the frame path
+    """
+    columns = [col for col in diff_info if col in df.columns]
+    values = df.to_numpy()
+    positions = df.columns.get_indexer(columns)
+    in_order = len(positions) == values.shape[1] and (positions == np.arange(len(positions))).all()
+    block = values.copy() if in_order else values[:, positions]
+    block = difference_block(block, [diff_info[col]['order'] for col in columns])
+    return pd.DataFrame(block, index=df.index[len(df) - len(block):],
+                        columns=[diff_info[col]['name'] for col in columns], copy=False)
+
+
 def remove_low_variance_variables(data_stationary, data_test_stationary):
     """Remove variables with very low variance"""
     print("Coefficient of variation before removal:")
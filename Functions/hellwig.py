@@ -1,6 +1,24 @@
+import heapq
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, combinations
+from math import comb
 import pandas as pd
-from itertools import combinations
 import numpy as np
+from Functions.correlation import correlation_matrix
+
+__all__ = ['hellwig_method_original', 'hellwig_method_bitmask', 'hellwig_method_parallel']
+
+
+def _hellwig_correlations(y, X):
+    """Return correlations of X with y (r0) and between X variables (Rxx)"""
+    combined_data = pd.concat([y.reset_index(drop=True), X.reset_index(drop=True)], axis=1)
+    R = correlation_matrix(combined_data).values
+
+    r0 = R[1:, 0]  # correlations of X variables with y
+    Rxx = R[1:, 1:]  # correlation matrix between X variables
+    return r0, Rxx
+
 
 def hellwig_method_original(y, X):
     """
@@ -9,12 +27,7 @@ def hellwig_method_original(y, X):
     H_k = sum h_kj
     """
     all_vars = list(X.columns)
-
-    combined_data = pd.concat([y.reset_index(drop=True), X.reset_index(drop=True)], axis=1)
-    R = combined_data.corr().values
-
-    r0 = R[1:, 0]  # correlations of X variables with y
-    Rxx = R[1:, 1:]  # correlation matrix between X variables
+    r0, Rxx = _hellwig_correlations(y, X)
 
     results = []
 
@@ -44,3 +57,268 @@ def hellwig_method_original(y, X):
 
     results.sort(key=lambda x: x['capacity'], reverse=True)
     return results
+
+
+def _mask_bits(masks, n_vars):
+    """Expand integer subset masks into a (len(masks), n_vars) 0/1 matrix"""
+    return ((masks[:, None] >> np.arange(n_vars, dtype=np.int64)) & 1).astype(np.float64)
+
+
+def _block_capacities(bits, r0_sq, abs_Rxx):
+    """
+    Integral capacities H_k for a block of subsets at once
+    For j in the subset, sum_i bits_i * |r_ji| already contains |r_jj| = 1,
+    so it equals the Hellwig denominator 1 + sum |correlations with others|
+    """
+    row_sums = bits @ abs_Rxx
+    denom = np.where(bits > 0, row_sums, 1.0)
+    return (bits * r0_sq / denom).sum(axis=1)
+
+
+def _push_top_k(heap, capacities, masks, top_k):
+    """Merge a block of (capacity, mask) pairs into a bounded min-heap"""
+    if top_k is not None and len(capacities) > top_k:
+        keep = np.argpartition(capacities, -top_k)[-top_k:]
+        capacities = capacities[keep]
+        masks = masks[keep]
+
+    for capacity, mask in zip(capacities.tolist(), masks.tolist()):
+        if top_k is None or len(heap) < top_k:
+            heapq.heappush(heap, (capacity, -mask))
+        elif capacity > heap[0][0]:
+            heapq.heapreplace(heap, (capacity, -mask))
+
+
+def _format_results(entries, all_vars):
+    """Convert (capacity, indices) pairs to the result format of hellwig_method_original"""
+    # Ties keep the enumeration order of the original method: by size, then lexicographic
+    entries = sorted(entries, key=lambda e: (-e[0], len(e[1]), list(e[1])))
+
+    results = []
+    for capacity, indices in entries:
+        combo_vars = [all_vars[i] for i in indices]
+        results.append({
+            'variables': ', '.join(combo_vars),
+            'capacity': float(capacity),
+            'var_list': combo_vars
+        })
+    return results
+
+
+def _results_from_heap(heap, all_vars):
+    """Convert retained masks to the result format of hellwig_method_original"""
+    n_vars = len(all_vars)
+    entries = []
+    for capacity, neg_mask in heap:
+        indices = [i for i in range(n_vars) if (-neg_mask >> i) & 1]
+        entries.append((capacity, indices))
+    return _format_results(entries, all_vars)
+
+
+def hellwig_method_bitmask(y, X, top_k=100, block_size=65536):
+    """
+    Vectorized Hellwig's method over integer subset masks
+    Capacities are computed for blocks of masks with NumPy and only the
+    top_k best combinations are retained (top_k=None keeps all of them)
+    """
+    all_vars = list(X.columns)
+    n_vars = len(all_vars)
+    if n_vars > 62:
+        raise ValueError(f"Too many candidate variables for bitmask encoding: {n_vars}")
+    if top_k is not None and top_k < 1:
+        raise ValueError("top_k must be a positive integer or None")
+
+    r0, Rxx = _hellwig_correlations(y, X)
+    r0_sq = r0 ** 2
+    abs_Rxx = np.abs(Rxx)
+    np.fill_diagonal(abs_Rxx, 1.0)
+
+    heap = []
+    n_masks = 1 << n_vars
+    for start in range(1, n_masks, block_size):
+        masks = np.arange(start, min(start + block_size, n_masks), dtype=np.int64)
+        capacities = _block_capacities(_mask_bits(masks, n_vars), r0_sq, abs_Rxx)
+        _push_top_k(heap, capacities, masks, top_k)
+
+    return _results_from_heap(heap, all_vars)
+
+
+# Read-only matrices shared with pool workers, set once per process by _init_worker
+_SHARED = {}
+
+# Upper limit on elements of the (block, k, k) correlation tensor built per block
+_BLOCK_ELEMENTS = 1 << 21
+
+
+def _init_worker(r0_sq, abs_Rxx):
+    """Store the correlation inputs in the worker process"""
+    _SHARED['r0_sq'] = r0_sq
+    _SHARED['abs_Rxx'] = abs_Rxx
+
+
+def _unrank_combination(rank, n, k):
+    """Return the combination at position rank in itertools.combinations(range(n), k)"""
+    combo = []
+    x = 0
+    for i in range(k):
+        while True:
+            count = comb(n - x - 1, k - i - 1)
+            if rank < count:
+                break
+            rank -= count
+            x += 1
+        combo.append(x)
+        x += 1
+    return combo
+
+
+def _iter_combinations(n, first, count):
+    """Yield count combinations in lexicographic order starting from first"""
+    c = list(first)
+    k = len(c)
+    for _ in range(count):
+        yield c
+        i = k - 1
+        while i >= 0 and c[i] == n - k + i:
+            i -= 1
+        if i < 0:
+            return
+        c[i] += 1
+        for j in range(i + 1, k):
+            c[j] = c[j - 1] + 1
+
+
+def _combo_capacities(idx, r0_sq, abs_Rxx):
+    """Integral capacities for a (block, k) array of variable indices"""
+    denom = abs_Rxx[idx[:, :, None], idx[:, None, :]].sum(axis=2)
+    return (r0_sq[idx] / denom).sum(axis=1)
+
+
+def _push_combos(heap, capacities, idx, top_k):
+    """Merge a block of combinations into a bounded min-heap of (capacity, indices)"""
+    if len(capacities) > top_k:
+        keep = np.argpartition(capacities, -top_k)[-top_k:]
+        capacities = capacities[keep]
+        idx = idx[keep]
+
+    for capacity, indices in zip(capacities.tolist(), idx.tolist()):
+        if len(heap) < top_k:
+            heapq.heappush(heap, (capacity, tuple(indices)))
+        elif capacity > heap[0][0]:
+            heapq.heapreplace(heap, (capacity, tuple(indices)))
+
+
+def _rank_range_shard(k, start, count, top_k):
+    """Exhaustively score combinations of size k with ranks in [start, start + count)"""
+    r0_sq = _SHARED['r0_sq']
+    abs_Rxx = _SHARED['abs_Rxx']
+    n = len(r0_sq)
+
+    heap = []
+    block = max(1, _BLOCK_ELEMENTS // (k * k))
+    combos = _iter_combinations(n, _unrank_combination(start, n, k), count)
+    while count > 0:
+        size = min(block, count)
+        flat = chain.from_iterable(next(combos) for _ in range(size))
+        idx = np.fromiter(flat, dtype=np.int64, count=size * k).reshape(size, k)
+        _push_combos(heap, _combo_capacities(idx, r0_sq, abs_Rxx), idx, top_k)
+        count -= size
+    return heap
+
+
+def _pruned_shard(k, first, top_k, floor):
+    """
+    Depth-first search over combinations of size k starting with variable first
+    A prefix is skipped when its upper bound cannot beat the local K-th best
+    (or floor, a K-th best capacity already known from small subsets):
+    adding variables only increases the prefix denominators, and each remaining
+    slot contributes at most r0_i^2 / (1 + sum of |r_ip| over the prefix)
+    """
+    r0_sq = _SHARED['r0_sq']
+    abs_Rxx = _SHARED['abs_Rxx']
+    n = len(r0_sq)
+    heap = []
+
+    def extend(prefix):
+        last = prefix[-1]
+        candidates = np.arange(last + 1, n)
+        remaining = k - len(prefix)
+        denom_prefix = abs_Rxx[np.ix_(prefix, prefix)].sum(axis=1)
+        cross = abs_Rxx[np.ix_(prefix, candidates)]
+        gain = r0_sq[candidates] / (1.0 + cross.sum(axis=0))
+
+        bound = (r0_sq[prefix] / denom_prefix).sum()
+        bound += np.sort(gain)[::-1][:remaining].sum()
+        if bound < floor or (len(heap) == top_k and bound <= heap[0][0]):
+            return
+
+        if remaining == 1:
+            capacities = (r0_sq[prefix][:, None] / (denom_prefix[:, None] + cross)).sum(axis=0) + gain
+            idx = np.column_stack([np.tile(prefix, (len(candidates), 1)), candidates])
+            _push_combos(heap, capacities, idx, top_k)
+            return
+
+        for nxt in candidates[:len(candidates) - remaining + 1].tolist():
+            extend(prefix + [nxt])
+
+    if k == 1:
+        heapq.heappush(heap, (float(r0_sq[first]), (first,)))
+    else:
+        extend([first])
+    return heap
+
+
+def _small_subset_floor(r0_sq, abs_Rxx, top_k):
+    """K-th best capacity among all subsets of size 1 and 2, a lower bound for the final K-th best"""
+    n = len(r0_sq)
+    i, j = np.triu_indices(n, k=1)
+    pair_capacities = r0_sq[i] / (1.0 + abs_Rxx[i, j]) + r0_sq[j] / (1.0 + abs_Rxx[i, j])
+    capacities = np.concatenate([r0_sq, pair_capacities])
+    if len(capacities) < top_k:
+        return -np.inf
+    return np.partition(capacities, -top_k)[-top_k]
+
+
+def hellwig_method_parallel(y, X, top_k=100, max_size=None, n_jobs=None,
+                            prune=False, chunk_size=200000):
+    """
+    Hellwig's method sharded across a process pool
+    The combination space is split by subset size and by rank ranges within
+    itertools.combinations (or by first variable when prune=True, which enables
+    branch-and-bound pruning); per-shard top_k lists are merged at the end
+    """
+    all_vars = list(X.columns)
+    n_vars = len(all_vars)
+    if top_k < 1:
+        raise ValueError("top_k must be a positive integer")
+    max_size = n_vars if max_size is None else min(max_size, n_vars)
+    n_jobs = n_jobs or os.cpu_count() or 1
+
+    r0, Rxx = _hellwig_correlations(y, X)
+    r0_sq = r0 ** 2
+    abs_Rxx = np.abs(Rxx)
+    np.fill_diagonal(abs_Rxx, 1.0)
+
+    floor = _small_subset_floor(r0_sq, abs_Rxx, top_k) if prune else -np.inf
+
+    shards = []
+    for k in range(1, max_size + 1):
+        if prune:
+            shards.extend((_pruned_shard, (k, first, top_k, floor)) for first in range(n_vars - k + 1))
+        else:
+            total = comb(n_vars, k)
+            shards.extend((_rank_range_shard, (k, start, min(chunk_size, total - start), top_k))
+                          for start in range(0, total, chunk_size))
+
+    heap = []
+    with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                             initargs=(r0_sq, abs_Rxx)) as executor:
+        futures = [executor.submit(func, *args) for func, args in shards]
+        for future in futures:
+            for capacity, indices in future.result():
+                if len(heap) < top_k:
+                    heapq.heappush(heap, (capacity, indices))
+                elif capacity > heap[0][0]:
+                    heapq.heapreplace(heap, (capacity, indices))
+
+    return _format_results(heap, all_vars)
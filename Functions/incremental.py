@@ -0,0 +1,208 @@
+import pickle
+from dataclasses import dataclass
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from Functions.data_preparation import load_prepared_data
+from Functions.stationarity_check import batch_stationarity
+
+__all__ = ['PIPELINE_STATE_PATH', 'PipelineState', 'init_pipeline_state', 'update_pipeline_state',
+           'predict_with_state', 'save_pipeline_state', 'load_pipeline_state', 'run_incremental_update']
+
+PIPELINE_STATE_PATH = Path(".cache") / "pipeline_state.pkl"
+
+
+@dataclass
+class PipelineState:
+    """Running state of the pipeline that new monthly rows are folded into"""
+    response_var: str
+    raw_response: str
+    raw_columns: list
+    log_columns: list
+    diff_info: dict
+    best_vars: list
+    max_diff: int
+    n_raw: int
+    raw_sums: np.ndarray
+    raw_cross: np.ndarray
+    last_raw: np.ndarray
+    last_log_levels: np.ndarray
+    stationary_columns: list
+    stationary_history: np.ndarray
+    gram: np.ndarray
+    tested_mean: np.ndarray
+    tested_std: np.ndarray
+    drift_threshold: float
+    coefficients: np.ndarray
+
+    def correlations_with_y(self):
+        """Correlations of the raw levels with the raw response from running sums"""
+        n = self.n_raw
+        cov = self.raw_cross - np.outer(self.raw_sums, self.raw_sums) / n
+        std = np.sqrt(np.diag(cov))
+        j = self.raw_columns.index(self.raw_response)
+        corr = cov[:, j] / (std * std[j])
+        return pd.Series(corr, index=self.raw_columns).drop(self.raw_response)
+
+    def model_columns(self):
+        """Gram matrix positions of the constant and the selected regressors"""
+        return [0] + [self.stationary_columns.index(v) + 1 for v in self.best_vars]
+
+
+def _solve_normal_equations(gram, columns, response_column):
+    """Coefficients of the model from the accumulated cross products"""
+    return np.linalg.solve(gram[np.ix_(columns, columns)], gram[columns, response_column])
+
+
+def init_pipeline_state(data_raw, data_log, data_stationary, diff_info, best_vars,
+                        response_var='D_CLOSE', max_diff=2, drift_threshold=0.5):
+    """
+    Build the running state from the outputs of a full pipeline run
+    data_raw holds the interpolated levels of every row of the data file (its length
+    marks where appended rows start), data_log the log levels the differencing in
+    diff_info was applied to
+    """
+    raw_response = next(var for var, info in diff_info.items() if info['name'] == response_var)
+    raw = data_raw.to_numpy(dtype=np.float64)
+    stationary = data_stationary.to_numpy(dtype=np.float64)
+    Z = np.column_stack([np.ones(len(stationary)), stationary])
+    gram = Z.T @ Z
+
+    stationary_columns = list(data_stationary.columns)
+    state = PipelineState(
+        response_var=response_var,
+        raw_response=raw_response,
+        raw_columns=list(data_raw.columns),
+        log_columns=list(data_log.columns),
+        diff_info=diff_info,
+        best_vars=list(best_vars),
+        max_diff=max_diff,
+        n_raw=len(raw),
+        raw_sums=raw.sum(axis=0),
+        raw_cross=raw.T @ raw,
+        last_raw=raw[-1].copy(),
+        last_log_levels=data_log.to_numpy(dtype=np.float64)[-max_diff:].copy(),
+        stationary_columns=stationary_columns,
+        stationary_history=stationary.copy(),
+        gram=gram,
+        tested_mean=stationary.mean(axis=0),
+        tested_std=stationary.std(axis=0, ddof=1),
+        drift_threshold=drift_threshold,
+        coefficients=np.empty(0),
+    )
+    state.coefficients = _solve_normal_equations(
+        gram, state.model_columns(), stationary_columns.index(response_var) + 1)
+    return state
+
+
+def _fill_forward(block, last_row):
+    """Replace missing (or masked) values with the previous observation"""
+    block = block.copy()
+    previous = last_row
+    for t in range(len(block)):
+        missing = np.isnan(block[t])
+        block[t, missing] = previous[missing]
+        previous = block[t]
+    return block
+
+
+def update_pipeline_state(state, new_rows):
+    """
+    Fold newly appended raw rows into the running state
+    Only the new rows are interpolated, log-transformed and differenced.
+    Stationarity tests are re-run only when the standardized mean of any
+    stationary series drifts by more than state.drift_threshold since the last test.
+    Returns out-of-sample predictions for the new rows and update details
+    """
+    raw = _fill_forward(new_rows[state.raw_columns].to_numpy(dtype=np.float64), state.last_raw)
+    state.raw_sums = state.raw_sums + raw.sum(axis=0)
+    state.raw_cross = state.raw_cross + raw.T @ raw
+    state.n_raw += len(raw)
+    state.last_raw = raw[-1].copy()
+
+    # Non-positive levels are replaced by the previous value before taking logs
+    levels = new_rows[state.log_columns].to_numpy(dtype=np.float64)
+    levels = np.where(levels > 0, levels, np.nan)
+    log_levels = _fill_forward(np.log(levels), state.last_log_levels[-1])
+
+    combined = np.vstack([state.last_log_levels, log_levels])
+    columns = {}
+    for j, var in enumerate(state.log_columns):
+        order = state.diff_info[var]['order']
+        current = combined[state.max_diff:, j]
+        columns[state.diff_info[var]['name']] = current if order == 0 else current - combined[state.max_diff - order:-order, j]
+    state.last_log_levels = combined[-state.max_diff:].copy()
+    stationary = np.column_stack([columns[name] for name in state.stationary_columns])
+
+    # Forecast the new rows with the current coefficients before updating them
+    response_column = state.stationary_columns.index(state.response_var)
+    Z = np.column_stack([np.ones(len(stationary)), stationary])
+    model_columns = state.model_columns()
+    predictions = Z[:, model_columns] @ state.coefficients
+
+    state.gram = state.gram + Z.T @ Z
+    state.coefficients = _solve_normal_equations(state.gram, model_columns, response_column + 1)
+    state.stationary_history = np.vstack([state.stationary_history, stationary])
+
+    history = state.stationary_history
+    drift = np.abs(history.mean(axis=0) - state.tested_mean) / state.tested_std
+    retested = bool(np.max(drift) > state.drift_threshold)
+    non_stationary = []
+    if retested:
+        table = batch_stationarity(pd.DataFrame(history, columns=state.stationary_columns))
+        non_stationary = list(table.loc[~table['stationary'], 'variable'])
+        state.tested_mean = history.mean(axis=0)
+        state.tested_std = history.std(axis=0, ddof=1)
+
+    return {
+        'predictions': predictions,
+        'actuals': stationary[:, response_column],
+        'coefficients': pd.Series(state.coefficients, index=['const'] + state.best_vars),
+        'correlations_with_y': state.correlations_with_y(),
+        'max_drift': float(np.max(drift)),
+        'retested': retested,
+        'non_stationary': non_stationary,
+    }
+
+
+def predict_with_state(state, data):
+    """Forecast the response from transformed regressors (columns state.best_vars) with the stored coefficients"""
+    X = data[state.best_vars].to_numpy(dtype=np.float64)
+    return pd.Series(state.coefficients[0] + X @ state.coefficients[1:], index=data.index, name=state.response_var)
+
+
+def save_pipeline_state(state, path=PIPELINE_STATE_PATH):
+    """Persist the running state"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'wb') as f:
+        pickle.dump(state, f)
+
+
+def load_pipeline_state(path=PIPELINE_STATE_PATH):
+    """Load a persisted running state"""
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def run_incremental_update(filepath, state_path=PIPELINE_STATE_PATH):
+    """Fold rows appended to the data file since the last run into the stored state"""
+    state = load_pipeline_state(state_path)
+    data = load_prepared_data(filepath)
+    new_rows = data.iloc[state.n_raw:]
+    if new_rows.empty:
+        print("No new observations to fold in")
+        return state, None
+
+    report = update_pipeline_state(state, new_rows)
+    save_pipeline_state(state, state_path)
+
+    print(f"Folded {len(new_rows)} new observations (total {state.n_raw})")
+    print(f"Max stationarity drift: {report['max_drift']:.4f}"
+          + (" -> re-tested" if report['retested'] else ""))
+    if report['non_stationary']:
+        print(f"Warning: non-stationary after update: {report['non_stationary']}")
+    print("Updated coefficients:")
+    for name, coef in report['coefficients'].items():
+        print(f"  {name}: {coef:.6f}")
+    return state, report
@@ -0,0 +1,163 @@
+import contextlib
+import io
+import json
+import logging
+import resource
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, is_dataclass
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+
+__all__ = ['logger', 'configure_logging', 'ensure_logging', 'console_to_log', 'summarize_value', 'RunRecorder']
+
+logger = logging.getLogger("econometric")
+
+
+def configure_logging(level=logging.INFO):
+    """Send pipeline events to stdout as plain messages, filtered by level"""
+    if isinstance(level, str):
+        level = getattr(logging, level.upper())
+    logger.setLevel(level)
+    ensure_logging()
+
+
+def ensure_logging():
+    """
+    Install the stdout handler of configure_logging if the logger has none, so library
+    calls of run_pipeline still print; a level set earlier is kept (INFO if unset)
+    """
+    if logger.handlers:
+        return
+    if logger.level == logging.NOTSET:
+        logger.setLevel(logging.INFO)
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.propagate = False
+
+
+class _LogWriter(io.TextIOBase):
+    """File-like object forwarding printed lines to the logger; skipped lines cost no I/O"""
+
+    def __init__(self, level):
+        self.level = level
+        self.buffer = ''
+
+    def write(self, s):
+        if not logger.isEnabledFor(self.level):
+            return len(s)
+        self.buffer += s
+        while '\n' in self.buffer:
+            line, self.buffer = self.buffer.split('\n', 1)
+            logger.log(self.level, line)
+        return len(s)
+
+    def flush(self):
+        if self.buffer:
+            logger.log(self.level, self.buffer)
+            self.buffer = ''
+
+
+@contextlib.contextmanager
+def console_to_log(level=logging.INFO):
+    """Route print() output of the wrapped block through the logger"""
+    writer = _LogWriter(level)
+    try:
+        with contextlib.redirect_stdout(writer):
+            yield
+    finally:
+        writer.flush()
+
+
+def _peak_rss_mb():
+    """Peak resident set size over the process lifetime (ru_maxrss is KiB on Linux, bytes on macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+def summarize_value(value):
+    """JSON-friendly summary of a stage output"""
+    if isinstance(value, pd.DataFrame):
+        return {'rows': value.shape[0], 'columns': value.shape[1]}
+    if isinstance(value, pd.Series):
+        return {'rows': len(value)}
+    if is_dataclass(value):
+        return summarize_value(asdict(value))
+    if hasattr(value, 'params') and hasattr(value, 'pvalues'):
+        return {
+            'params': summarize_value(dict(value.params)),
+            'pvalues': summarize_value(dict(value.pvalues)),
+            'rsquared': float(value.rsquared),
+            'nobs': int(value.nobs),
+        }
+    if isinstance(value, dict):
+        return {str(k): summarize_value(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        if len(value) > 20:
+            return {'length': len(value)}
+        return [summarize_value(v) for v in value]
+    if isinstance(value, (np.integer, int)):
+        return int(value)
+    if isinstance(value, (np.floating, float)):
+        return None if np.isnan(value) else float(value)
+    if isinstance(value, (str, bool)) or value is None:
+        return value
+    return type(value).__name__
+
+
+class RunRecorder:
+    """
+    Collects per-stage timing, memory and key outputs into a single run report
+    Per-stage memory is the tracemalloc peak of the stage (with trace_memory); the
+    process-wide peak RSS, which only ever grows, is reported once for the run
+    """
+
+    def __init__(self, config=None, trace_memory=False):
+        self.config = dict(config or {})
+        self.trace_memory = trace_memory
+        self.stages = []
+        self.started = datetime.now(timezone.utc)
+        self._wall = time.perf_counter()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Time a stage; the yielded dict can be filled with 'cached' and 'outputs'"""
+        record = {'name': name, 'cached': False, 'outputs': {}}
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield record
+        finally:
+            record['wall_s'] = time.perf_counter() - wall
+            record['cpu_s'] = time.process_time() - cpu
+            memory = ""
+            if self.trace_memory:
+                record['peak_traced_mb'] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+                memory = f", traced peak {record['peak_traced_mb']:.1f} MB"
+            self.stages.append(record)
+            logger.debug(f"[{name}] wall {record['wall_s']:.4f} s, cpu {record['cpu_s']:.4f} s{memory}"
+                         + (" (cached)" if record['cached'] else ""))
+
+    def report(self):
+        return {
+            'started': self.started.isoformat(),
+            'wall_s': time.perf_counter() - self._wall,
+            'process_peak_rss_mb': _peak_rss_mb(),
+            'config': summarize_value(self.config),
+            'stages': self.stages,
+        }
+
+    def write(self, path):
+        """Write the run report as JSON"""
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+        logger.info(f"Run report written to {path}")
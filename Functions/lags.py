@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+__all__ = ['lag_name', 'lag_view', 'lagged_frame', 'add_lag_features']
+
+
+def lag_name(var, lag):
+    """Column name of var lagged by lag periods (lag 0 keeps the name)"""
+    return var if lag == 0 else f"{var}_L{lag}"
+
+
+def lag_view(values, max_lag):
+    """
+    Read-only (n - max_lag, k, max_lag + 1) view of an (n, k) array with
+    view[t, j, l] = values[t + max_lag - l, j], i.e. lag l of row t + max_lag
+    Nothing is copied, whatever max_lag
+    """
+    return sliding_window_view(values, max_lag + 1, axis=0)[..., ::-1]
+
+
+def lagged_frame(data, max_lag, lag_vars=()):
+    """
+    data with lags 1..max_lag of lag_vars added next to each variable
+    The first max_lag rows are dropped, so every feature only uses earlier rows.
+    All columns are views of one float64 array of data's values
+    """
+    values = data.to_numpy(dtype=np.float64)
+    view = lag_view(values, max_lag)
+    columns = {}
+    for j, col in enumerate(data.columns):
+        for lag in range(max_lag + 1 if col in lag_vars else 1):
+            columns[lag_name(col, lag)] = view[:, j, lag]
+    return pd.DataFrame(columns, index=data.index[max_lag:], copy=False)
+
+
+def add_lag_features(data_stationary, data_test_stationary, response_var, max_lag, lag_vars=None):
+    """
+    Distributed-lag regressors (lags 0..max_lag) for the training and test data
+    lag_vars defaults to every regressor; the response is never lagged. Lags are
+    taken within each sample, so test features never reach back across the gap
+    left by differencing into training rows, and no feature looks ahead.
+    The first max_lag rows of each sample are dropped
+    """
+    if max_lag < 0:
+        raise ValueError("max_lag must be non-negative")
+    if lag_vars is None:
+        lag_vars = [col for col in data_stationary.columns if col != response_var]
+    unknown = [var for var in lag_vars if var not in data_stationary.columns or var == response_var]
+    if unknown:
+        raise ValueError(f"Cannot build lags of: {unknown}")
+    if max_lag == 0:
+        return data_stationary, data_test_stationary
+    if min(len(data_stationary), len(data_test_stationary)) <= max_lag:
+        raise ValueError(f"max_lag={max_lag} leaves no observations")
+
+    return (lagged_frame(data_stationary, max_lag, lag_vars),
+            lagged_frame(data_test_stationary[data_stationary.columns], max_lag, lag_vars))
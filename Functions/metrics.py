@@ -0,0 +1,204 @@
+import numpy as np
+import pandas as pd
+
+__all__ = ['METRIC_NAMES', 'forecast_metrics_batch', 'directional_accuracy', 'diebold_mariano',
+           'evaluate_forecasts', 'block_bootstrap_indices', 'bootstrap_metric_ci', 'bootstrap_coefficient_ci']
+
+METRIC_NAMES = ('mae', 'rmse', 'mape', 'smape')
+
+
+def _masked_mean(values, valid):
+    """Mean along the last axis over valid entries; NaN where there are none"""
+    count = valid.sum(axis=-1)
+    total = np.where(valid, values, 0.0).sum(axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(count > 0, total / count, np.nan)
+
+
+def forecast_metrics_batch(actual, predicted):
+    """
+    MAE, RMSE, MAPE and sMAPE along the last axis of (..., n) arrays
+    Pairs with a missing actual or prediction are ignored everywhere; MAPE also
+    ignores zero actuals and sMAPE observations where both values are zero
+    """
+    actual = np.asarray(actual, dtype=np.float64)
+    predicted = np.asarray(predicted, dtype=np.float64)
+    errors = actual - predicted
+    abs_errors = np.abs(errors)
+    valid = np.isfinite(errors)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ape = abs_errors / np.abs(actual) * 100
+        sape = 2 * abs_errors / (np.abs(actual) + np.abs(predicted)) * 100
+
+    return {
+        'mae': _masked_mean(abs_errors, valid),
+        'rmse': np.sqrt(_masked_mean(errors ** 2, valid)),
+        'mape': _masked_mean(ape, valid & np.isfinite(ape)),
+        'smape': _masked_mean(sape, valid & np.isfinite(sape)),
+    }
+
+
+def directional_accuracy(actual, predicted):
+    """Share of observations with a non-zero actual change whose sign the forecast gets right"""
+    actual = np.asarray(actual, dtype=np.float64)
+    predicted = np.asarray(predicted, dtype=np.float64)
+    valid = np.isfinite(actual) & np.isfinite(predicted) & (actual != 0)
+    return _masked_mean((np.sign(actual) == np.sign(predicted)).astype(np.float64), valid)
+
+
+def diebold_mariano(errors, benchmark_errors, horizon=1, power=2):
+    """
+    Diebold-Mariano test of equal accuracy along the last axis, with the
+    Harvey-Leybourne-Newbold small-sample correction
+    Loss is |e|^power; horizon broadcasts against the leading axes and sets the
+    h-1 autocovariances in the long-run variance. Negative statistics favour
+    errors over benchmark_errors. Returns (statistic, two-sided p-value)
+    """
+    from scipy.stats import t as t_dist
+
+    errors = np.asarray(errors, dtype=np.float64)
+    benchmark_errors = np.broadcast_to(np.asarray(benchmark_errors, dtype=np.float64), errors.shape)
+    d = np.abs(errors) ** power - np.abs(benchmark_errors) ** power
+    valid = np.isfinite(d)
+    n = valid.sum(axis=-1)
+    d_mean = _masked_mean(d, valid)
+    centered = np.where(valid, d - d_mean[..., None], 0.0)
+
+    horizon = np.broadcast_to(np.asarray(horizon), d_mean.shape)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        long_run = np.einsum('...t,...t->...', centered, centered) / n
+        for lag in range(1, int(horizon.max(initial=1))):
+            gamma = np.einsum('...t,...t->...', centered[..., lag:], centered[..., :-lag]) / n
+            long_run = long_run + np.where(lag < horizon, 2 * gamma, 0.0)
+
+        statistic = d_mean / np.sqrt(long_run / n)
+        statistic = np.where(long_run > 0, statistic, np.nan)
+        statistic = statistic * np.sqrt((n + 1 - 2 * horizon + horizon * (horizon - 1) / n) / n)
+        p_value = 2 * t_dist.sf(np.abs(statistic), np.maximum(n - 1, 1))
+    return statistic, p_value
+
+
+def evaluate_forecasts(actual, predictions, models=None, horizons=None, benchmark=None, sort_by=None):
+    """
+    Evaluate many models x horizons against the same actuals in one vectorized pass
+    predictions has shape (models, observations) or (models, horizons, observations);
+    actual has shape (observations,) or (horizons, observations). Diebold-Mariano
+    tests compare squared errors with a benchmark: a model index or name, or the
+    no-change forecast (zero, for a differenced response) when None.
+    Returns one row per model and horizon
+    """
+    predictions = np.asarray(predictions, dtype=np.float64)
+    if predictions.ndim == 2:
+        predictions = predictions[:, None, :]
+    n_models, n_horizons, _ = predictions.shape
+    actual = np.broadcast_to(np.asarray(actual, dtype=np.float64), predictions.shape[1:])
+    models = list(range(n_models)) if models is None else list(models)
+    horizons = np.arange(1, n_horizons + 1) if horizons is None else np.asarray(horizons)
+
+    errors = actual - predictions
+    if benchmark is None:
+        benchmark_errors = actual
+    else:
+        index = benchmark if isinstance(benchmark, (int, np.integer)) else models.index(benchmark)
+        benchmark_errors = errors[index]
+
+    metrics = forecast_metrics_batch(actual, predictions)
+    dm_stat, dm_pvalue = diebold_mariano(errors, benchmark_errors, horizons[None, :])
+    table = pd.DataFrame({
+        'model': np.repeat(models, n_horizons),
+        'horizon': np.tile(horizons, n_models),
+        'n_obs': np.isfinite(errors).sum(axis=-1).ravel(),
+        **{name: values.ravel() for name, values in metrics.items()},
+        'direction_accuracy': directional_accuracy(actual, predictions).ravel(),
+        'dm_stat': dm_stat.ravel(),
+        'dm_pvalue': dm_pvalue.ravel(),
+    })
+    if sort_by is not None:
+        table = table.sort_values(['horizon', sort_by], ascending=[True, sort_by != 'direction_accuracy'])
+    return table
+
+
+def block_bootstrap_indices(n, n_boot, block_size=None, seed=None):
+    """
+    Circular moving-block bootstrap indices as one (n_boot, n) array
+    Blocks of consecutive observations preserve short-range autocorrelation;
+    the default block length is n^(1/3)
+    """
+    if block_size is None:
+        block_size = max(1, int(round(n ** (1 / 3))))
+    rng = np.random.default_rng(seed)
+    n_blocks = -(-n // block_size)
+    starts = rng.integers(0, n, size=(n_boot, n_blocks))
+    idx = (starts[:, :, None] + np.arange(block_size)) % n
+    return idx.reshape(n_boot, -1)[:, :n]
+
+
+def _chunks(n_boot, chunk_size):
+    """Replicate ranges of at most chunk_size"""
+    chunk_size = chunk_size or n_boot
+    for start in range(0, n_boot, chunk_size):
+        yield start, min(start + chunk_size, n_boot)
+
+
+def _percentile_table(estimates, replicates, alpha):
+    """Point estimates with percentile confidence bounds; NaN replicates are left out and counted"""
+    rows = []
+    for name, estimate in estimates.items():
+        values = replicates[name]
+        values = values[~np.isnan(values)]
+        lower, upper = (np.quantile(values, [alpha / 2, 1 - alpha / 2]) if len(values) else (np.nan, np.nan))
+        rows.append({'name': name, 'estimate': float(estimate), 'lower': lower, 'upper': upper,
+                     'std_error': values.std(ddof=1) if len(values) > 1 else np.nan, 'replicates': len(values)})
+    return pd.DataFrame(rows).set_index('name')
+
+
+def bootstrap_metric_ci(actual, predicted, n_boot=2000, block_size=None, alpha=0.05,
+                        chunk_size=None, seed=None):
+    """
+    Block-bootstrap confidence intervals for MAE, RMSE, MAPE and sMAPE
+    All resample indices are drawn as one 2-D array and every replicate is
+    evaluated in a single vectorized pass (per chunk of chunk_size replicates)
+    """
+    actual = np.asarray(actual, dtype=np.float64)
+    predicted = np.asarray(predicted, dtype=np.float64)
+    idx = block_bootstrap_indices(len(actual), n_boot, block_size, seed)
+
+    replicates = {name: np.empty(n_boot) for name in METRIC_NAMES}
+    for start, stop in _chunks(n_boot, chunk_size):
+        chunk = idx[start:stop]
+        values = forecast_metrics_batch(actual[chunk], predicted[chunk])
+        for name in METRIC_NAMES:
+            replicates[name][start:stop] = values[name]
+
+    estimates = {name: value for name, value in forecast_metrics_batch(actual, predicted).items()}
+    return _percentile_table(estimates, replicates, alpha)
+
+
+def bootstrap_coefficient_ci(model, n_boot=2000, block_size=None, alpha=0.05, chunk_size=500, seed=None):
+    """
+    Block-bootstrap (pairs) confidence intervals for OLS coefficients
+    Resampled normal equations of all replicates in a chunk are built with
+    one einsum and solved together. Replicates whose resampled regressors are
+    rank-deficient (e.g. a sparse dummy never drawn) are dropped; the 'replicates'
+    column counts the ones used
+    """
+    X = np.asarray(model.model.exog, dtype=np.float64)
+    y = np.asarray(model.model.endog, dtype=np.float64)
+    names = list(model.model.exog_names)
+    idx = block_bootstrap_indices(len(y), n_boot, block_size, seed)
+
+    coefficients = np.empty((n_boot, X.shape[1]))
+    for start, stop in _chunks(n_boot, chunk_size):
+        Xb = X[idx[start:stop]]
+        yb = y[idx[start:stop]]
+        gram = np.einsum('bnp,bnq->bpq', Xb, Xb)
+        moments = np.einsum('bnp,bn->bp', Xb, yb)
+        full_rank = np.linalg.matrix_rank(gram) == X.shape[1]
+        solved = np.full((stop - start, X.shape[1]), np.nan)
+        solved[full_rank] = np.linalg.solve(gram[full_rank], moments[full_rank][:, :, None])[:, :, 0]
+        coefficients[start:stop] = solved
+
+    estimates = dict(zip(names, np.asarray(model.params, dtype=np.float64)))
+    replicates = {name: coefficients[:, j] for j, name in enumerate(names)}
+    return _percentile_table(estimates, replicates, alpha)
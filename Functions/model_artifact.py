@@ -0,0 +1,163 @@
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+__all__ = ['MODEL_ARTIFACT_PATH', 'ModelArtifact', 'build_model_artifact', 'save_model_artifact',
+           'load_model_artifact', 'predict_levels', 'append_observations']
+
+MODEL_ARTIFACT_PATH = Path("model") / "model_artifact.json"
+ARTIFACT_VERSION = 1
+
+
+@dataclass
+class ModelArtifact:
+    """
+    Everything needed to forecast from raw levels without the pipeline or statsmodels
+    recipe maps each raw input to its log-differenced model variable; history holds
+    the last max_diff raw levels of raw_columns (response first); residuals are the
+    in-sample residuals of the fit, used for bootstrapped noise in scenario simulation
+    """
+    response: str
+    response_var: str
+    variables: list
+    coefficients: list
+    recipe: dict
+    raw_columns: list
+    history: list
+    max_diff: int
+    residuals: list = field(default_factory=list)
+
+    @property
+    def orders(self):
+        return np.array([self.recipe[col]['order'] for col in self.raw_columns])
+
+
+def build_model_artifact(params, diff_info, data_raw, response_var='D_CLOSE', max_diff=2, residuals=None):
+    """
+    Collect the fitted coefficients (const first, as in model.params), the
+    log/differencing recipe of the response and the selected regressors, the
+    last max_diff rows of their raw levels from data_raw and, optionally, the residuals
+    """
+    params = pd.Series(params)
+    variables = [name for name in params.index if name != 'const']
+    raw_of = {info['name']: var for var, info in diff_info.items()}
+    response = raw_of[response_var]
+    raw_columns = [response] + [raw_of[name] for name in variables]
+    recipe = {var: {'name': diff_info[var]['name'], 'order': int(diff_info[var]['order']), 'transform': 'log'}
+              for var in raw_columns}
+    return ModelArtifact(
+        response=response,
+        response_var=response_var,
+        variables=variables,
+        coefficients=[float(params.get('const', 0.0))] + [float(params[name]) for name in variables],
+        recipe=recipe,
+        raw_columns=raw_columns,
+        history=data_raw[raw_columns].to_numpy(dtype=np.float64)[-max_diff:].tolist(),
+        max_diff=int(max_diff),
+        residuals=[] if residuals is None else np.asarray(residuals, dtype=np.float64).tolist(),
+    )
+
+
+def save_model_artifact(artifact, path=MODEL_ARTIFACT_PATH):
+    """Write the artifact as JSON (atomically)"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps({'version': ARTIFACT_VERSION, **asdict(artifact)}, indent=2))
+    os.replace(tmp_path, path)
+
+
+def load_model_artifact(path=MODEL_ARTIFACT_PATH):
+    """Read an artifact written by save_model_artifact"""
+    fields = json.loads(Path(path).read_text())
+    version = fields.pop('version', None)
+    if version != ARTIFACT_VERSION:
+        raise ValueError(f"Unsupported model artifact version: {version}")
+    return ModelArtifact(**fields)
+
+
+def _fill_forward(values):
+    """Replace missing values with the last valid value above them in the same column"""
+    missing = np.isnan(values)
+    if not missing.any():
+        return values
+    rows = np.where(missing, 0, np.arange(len(values))[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    return np.take_along_axis(values, rows, axis=0)
+
+
+def _raw_block(artifact, rows):
+    """Raw levels of artifact.raw_columns as a 2-D float array; a missing response column is all NaN"""
+    if isinstance(rows, pd.DataFrame):
+        columns = [rows[col].to_numpy(dtype=np.float64) if col in rows.columns else np.full(len(rows), np.nan)
+                   for col in artifact.raw_columns]
+        return np.column_stack(columns)
+    if isinstance(rows, dict):
+        return np.array([[rows.get(col, np.nan) for col in artifact.raw_columns]], dtype=np.float64)
+    block = np.asarray(rows, dtype=np.float64)
+    return block[None, :] if block.ndim == 1 else block
+
+
+def predict_levels(artifact, rows):
+    """
+    Forecast the response for rows of raw (undifferenced) observations
+    rows is a DataFrame, a dict for a single observation, or an array whose columns
+    follow artifact.raw_columns. Regressors are log-differenced against the stored
+    history (missing values carry the previous observation forward); the forecast of
+    the differenced response is then inverse-differenced to a level. Observed response
+    values in rows serve as the base for later rows (one-step-ahead forecasts),
+    otherwise forecasts are chained. Returns a DataFrame for DataFrame input, else a
+    dict of arrays, keyed by response_var and response
+    """
+    history = np.asarray(artifact.history, dtype=np.float64)
+    block = _raw_block(artifact, rows)
+    n_history = len(history)
+
+    levels = np.vstack([history, block])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        logs = np.log(np.where(levels > 0, levels, np.nan))
+    observed_response = logs[:, 0].copy()
+    logs[:, 1:] = _fill_forward(logs[:, 1:])
+
+    # Model variables for the new rows: log levels or lag differences of log levels
+    orders = artifact.orders
+    transformed = logs[n_history:].copy()
+    for order in np.unique(orders[1:][orders[1:] > 0]):
+        columns = np.flatnonzero(orders == order)
+        columns = columns[columns > 0]
+        transformed[:, columns] -= logs[n_history - order:len(logs) - order, columns]
+
+    coefficients = np.asarray(artifact.coefficients)
+    forecast = coefficients[0] + transformed[:, 1:] @ coefficients[1:]
+
+    # Inverse differencing: log level = base d rows back + forecast increments since that base
+    order = orders[0]
+    log_level = forecast.copy()
+    if order > 0:
+        known = ~np.isnan(observed_response)
+        increments = np.concatenate([np.zeros(n_history), forecast])
+        for residue in range(order):
+            positions = np.arange(residue, len(levels), order)
+            steps = np.cumsum(increments[positions])
+            last_known = np.where(known[positions], np.arange(len(positions)), -1)
+            np.maximum.accumulate(last_known, out=last_known)
+            base = np.concatenate([[-1], last_known[:-1]])
+            value = observed_response[positions][base] + steps - steps[base]
+            new = positions >= n_history
+            log_level[positions[new] - n_history] = value[new]
+
+    result = {artifact.response_var: forecast, artifact.response: np.exp(log_level)}
+    if isinstance(rows, pd.DataFrame):
+        return pd.DataFrame(result, index=rows.index)
+    return result
+
+
+def append_observations(artifact, rows):
+    """Roll the stored history forward with observed raw rows (response included)"""
+    block = _raw_block(artifact, rows)
+    history = _fill_forward(np.vstack([np.asarray(artifact.history, dtype=np.float64), block]))
+    artifact.history = history[-artifact.max_diff:].tolist()
+    return artifact
@@ -1,7 +1,13 @@
-import statsmodels.api as sm
+import numpy as np
+import pandas as pd
+
+__all__ = ['build_ols_model', 'fit_subsets_batch']
+
 
 def build_ols_model(data_stationary, response_var='D_CLOSE', predictor_vars=None):
     """Build OLS regression model"""
+    import statsmodels.api as sm
+
     if predictor_vars is None:
         predictor_vars = [col for col in data_stationary.columns if col != response_var]
 
@@ -13,3 +19,79 @@ def build_ols_model(data_stationary, response_var='D_CLOSE', predictor_vars=None
     print(model.summary())
 
     return model, X_with_const
+
+
+def _subset_lists(subsets):
+    """Accept lists of variable names or Hellwig result dicts"""
+    return [list(s['var_list']) if isinstance(s, dict) else list(s) for s in subsets]
+
+
+def fit_subsets_batch(data_stationary, subsets, response_var='D_CLOSE', data_test=None):
+    """
+    Fit OLS (with constant) for many regressor subsets from one Gram matrix
+    X'X and X'y are computed once for all candidate variables; subsets of the
+    same size are solved together from the sliced Gram blocks. Rank-deficient
+    subsets (collinear or constant regressors) get the minimum-norm least-squares
+    fit and rank-based degrees of freedom, as statsmodels' pinv fit does.
+    Returns a table with R^2, adjusted R^2, AIC, BIC and, if data_test is
+    given, out-of-sample RMSE, in the order of subsets
+    """
+    var_lists = _subset_lists(subsets)
+    candidates = [col for col in data_stationary.columns
+                  if col != response_var and any(col in v for v in var_lists)]
+    position = {var: i + 1 for i, var in enumerate(candidates)}  # column 0 is the constant
+
+    y = data_stationary[response_var].to_numpy(dtype=np.float64)
+    Z = np.column_stack([np.ones(len(y)), data_stationary[candidates].to_numpy(dtype=np.float64)])
+    n = len(y)
+    G = Z.T @ Z
+    c = Z.T @ y
+    yy = y @ y
+    tss = yy - n * y.mean() ** 2
+
+    if data_test is not None:
+        y_test = data_test[response_var].to_numpy(dtype=np.float64)
+        Z_test = np.column_stack([np.ones(len(y_test)), data_test[candidates].to_numpy(dtype=np.float64)])
+
+    n_subsets = len(var_lists)
+    metrics = {name: np.full(n_subsets, np.nan) for name in ('r2', 'adj_r2', 'aic', 'bic', 'rmse_test')}
+
+    sizes = np.array([len(v) for v in var_lists])
+    for size in np.unique(sizes):
+        members = np.flatnonzero(sizes == size)
+        idx = np.array([[0] + [position[v] for v in var_lists[m]] for m in members])
+        p = idx.shape[1]
+
+        G_sub = G[idx[:, :, None], idx[:, None, :]]
+        c_sub = c[idx]
+        Z_sub = np.moveaxis(Z[:, idx], 0, 1)
+        rank = np.linalg.matrix_rank(Z_sub)
+        full = rank == p
+        beta = np.empty((len(members), p))
+        if full.any():
+            beta[full] = np.linalg.solve(G_sub[full], c_sub[full][:, :, None])[:, :, 0]
+        if not full.all():
+            beta[~full] = np.einsum('bpn,n->bp', np.linalg.pinv(Z_sub[~full]), y)
+        ssr = yy - np.einsum('bp,bp->b', beta, c_sub)
+
+        r2 = 1.0 - ssr / tss
+        neg2llf = n * (np.log(2 * np.pi) + np.log(ssr / n) + 1)
+        metrics['r2'][members] = r2
+        metrics['adj_r2'][members] = 1.0 - (1.0 - r2) * (n - 1) / (n - rank)
+        metrics['aic'][members] = neg2llf + 2 * rank
+        metrics['bic'][members] = neg2llf + np.log(n) * rank
+
+        if data_test is not None:
+            predictions = np.einsum('tbp,bp->bt', Z_test[:, idx], beta)
+            metrics['rmse_test'][members] = np.sqrt(np.mean((y_test - predictions) ** 2, axis=1))
+
+    table = pd.DataFrame({
+        'variables': [', '.join(v) for v in var_lists],
+        'n_vars': sizes,
+        **metrics,
+        'var_list': var_lists,
+    })
+    if data_test is None:
+        table = table.drop(columns=['rmse_test'])
+    return table
+
@@ -0,0 +1,503 @@
+import contextlib
+import hashlib
+import json
+import os
+import pickle
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+import numpy as np
+import pandas as pd
+from Functions.data_preparation import (data_file_key, load_and_prepare_data, filter_by_correlation_with_y,
+                                        remove_inflation_variable, log_transform, remove_low_variance_variables,
+                                        log_transform_compact, difference_compact)
+from Functions.stationarity_check import (analyze_stationarity, differencing_orders, remove_nonstationarity,
+                                          apply_diff_to_test_data)
+from Functions.lags import add_lag_features
+from Functions.hellwig import hellwig_method_bitmask
+from Functions.stepwise import stepwise_selection
+from Functions.model_building import build_ols_model, fit_subsets_batch
+from Functions.metrics import bootstrap_metric_ci, bootstrap_coefficient_ci, evaluate_forecasts
+from Functions.incremental import PIPELINE_STATE_PATH, init_pipeline_state, save_pipeline_state
+from Functions.model_artifact import MODEL_ARTIFACT_PATH, build_model_artifact, save_model_artifact
+from Functions.instrumentation import RunRecorder, console_to_log, ensure_logging, logger, summarize_value
+
+# statsmodels diagnostics and matplotlib/seaborn are imported by the stages that need them
+__all__ = ['PIPELINE_CACHE_DIR', 'PIPELINE_VERSION', 'DEFAULT_CONFIG', 'Stage', 'STAGES', 'STAGE_NAMES',
+           'prune_stage_cache', 'run_pipeline']
+
+PIPELINE_CACHE_DIR = Path(".cache") / "stages"
+PIPELINE_VERSION = 2
+STAGE_CACHE_KEEP = 5
+
+DEFAULT_CONFIG = {
+    'data_path': 'data.xlsx',
+    'y_name': 'CLOSE',
+    'low_thr': 0.3,
+    'high_thr': 0.75,
+    'max_diff': 2,
+    'hellwig_top_k': 100,
+    'compare_top_n': 10,
+    'max_lag': 0,
+    'lag_vars': None,
+    'selection_method': 'hellwig',
+    'stepwise_direction': 'both',
+    'stepwise_criterion': 'aic',
+    'save_state': True,
+    'state_path': str(PIPELINE_STATE_PATH),
+    'n_jobs': None,
+    'plots': True,
+    'headless': False,
+    'plot_dpi': 300,
+    'plot_format': 'png',
+    'report_path': None,
+    'trace_memory': False,
+    'prune_cache': True,
+    'bootstrap_reps': 2000,
+    'bootstrap_block': None,
+    'bootstrap_seed': 0,
+    'compact_dtype': None,
+    'data_cache': True,
+    'save_model': True,
+    'model_path': str(MODEL_ARTIFACT_PATH),
+}
+
+
+@dataclass(frozen=True)
+class Stage:
+    """
+    A named pipeline step with the stages and config keys its output depends on
+    runtime config keys are passed to compute but do not affect the cache key
+    """
+    name: str
+    compute: Callable
+    depends_on: tuple = ()
+    params: tuple = ()
+    runtime: tuple = ()
+    report: Callable = None
+    cached: bool = True
+
+
+def _stage_load(artifacts, params):
+    print("1. Loading data...")
+    data_learning, data_test, alpha = load_and_prepare_data(params['data_path'], use_cache=params['data_cache'],
+                                                            dtype=params['compact_dtype'])
+    print(f"Data loaded: {data_learning.shape[0]} training obs., {data_test.shape[0]} test obs.")
+    print(f"Variables: {list(data_learning.columns)}")
+    return {'data_learning': data_learning, 'data_test': data_test, 'alpha': alpha}
+
+
+def _stage_correlation_filter(artifacts, params):
+    print("\n2. Filtering variables by correlation with target...")
+    data_filtered, removed_vars = filter_by_correlation_with_y(
+        artifacts['data_learning'], params['y_name'], params['low_thr'], params['high_thr'])
+    data_test = artifacts['data_test']
+    data_test = data_test.drop(columns=[v for v in removed_vars if v in data_test.columns], errors='ignore')
+
+    print("\n3. Removing INFLATION variable...")
+    data_filtered, data_test = remove_inflation_variable(data_filtered, data_test)
+    return {'data_filtered': data_filtered, 'data_test_filtered': data_test, 'removed_vars': removed_vars}
+
+
+def _stage_log_transform(artifacts, params):
+    print("\n4. Log transformation...")
+    transform = log_transform_compact if params['compact_dtype'] else log_transform
+    data_log = transform(artifacts['data_filtered'])
+    data_test_log = transform(artifacts['data_test_filtered'][data_log.columns])
+    return {'data_log': data_log, 'data_test_log': data_test_log}
+
+
+def _stage_stationarity(artifacts, params):
+    print("\n5. Stationarity analysis...")
+    non_stationary_vars, stationary_vars = analyze_stationarity(artifacts['data_log'], n_jobs=params['n_jobs'])
+    return {'non_stationary_vars': non_stationary_vars, 'stationary_vars': stationary_vars}
+
+
+def _stage_differencing(artifacts, params):
+    print("\n6. Removing non-stationarity through differencing...")
+    if params['compact_dtype']:
+        diff_info = differencing_orders(artifacts['data_log'], artifacts['non_stationary_vars'],
+                                        max_diff=params['max_diff'], n_jobs=params['n_jobs'])
+        data_stationary = difference_compact(artifacts['data_log'], diff_info)
+        data_test_stationary = difference_compact(artifacts['data_test_log'], diff_info)
+    else:
+        data_stationary, diff_info = remove_nonstationarity(
+            artifacts['data_log'], artifacts['non_stationary_vars'], max_diff=params['max_diff'],
+            n_jobs=params['n_jobs'])
+        data_test_stationary = apply_diff_to_test_data(artifacts['data_test_log'], diff_info)
+
+    print("\n7. Re-checking stationarity...")
+    analyze_stationarity(data_stationary, n_jobs=params['n_jobs'])
+
+    print("\n8. Removing low variance variables...")
+    data_stationary, data_test_stationary = remove_low_variance_variables(data_stationary, data_test_stationary)
+    return {'data_stationary': data_stationary, 'data_test_stationary': data_test_stationary,
+            'diff_info': diff_info, 'response_var': diff_info[params['y_name']]['name']}
+
+
+def _stage_lags(artifacts, params):
+    data_features, data_test_features = add_lag_features(
+        artifacts['data_stationary'], artifacts['data_test_stationary'], artifacts['response_var'],
+        params['max_lag'], params['lag_vars'])
+    if params['max_lag']:
+        print(f"\nDistributed lags 0..{params['max_lag']}: {data_features.shape[1] - 1} candidate regressors, "
+              f"{len(data_features)} training obs.")
+    return {'data_features': data_features, 'data_test_features': data_test_features}
+
+
+def _lagged_vars(artifacts):
+    """Selected regressors that are lags rather than contemporaneous model variables"""
+    return [var for var in artifacts['best_vars'] if var not in artifacts['data_stationary'].columns]
+
+
+def _select_stepwise(artifacts, params, Y, X):
+    direction, criterion = params['stepwise_direction'], params['stepwise_criterion']
+    print(f"\n9. Stepwise selection ({direction}, {criterion.upper()})...")
+    data_test = artifacts['data_test_features']
+    response_var = artifacts['response_var']
+    stepwise_results = stepwise_selection(Y, X, direction, criterion,
+                                          data_test[X.columns], data_test[response_var])
+
+    print("Selection path:")
+    for result in sorted(stepwise_results, key=lambda r: r['step']):
+        print(f"{result['step']}. {result['action']} -> {criterion.upper()}: {result['score']:.4f}")
+
+    best_vars = stepwise_results[0]['var_list']
+    if not best_vars:
+        raise ValueError("Stepwise selection kept no regressors")
+    comparison = fit_subsets_batch(artifacts['data_features'], stepwise_results[:params['compare_top_n']],
+                                   response_var, data_test)
+    print("\nModels on the selection path compared by fit:")
+    print(comparison[['variables', 'r2', 'adj_r2', 'aic', 'bic', 'rmse_test']].to_string(index=False))
+    print(f"\nSelected variables for model: {best_vars}")
+    return {'stepwise_results': stepwise_results, 'comparison': comparison, 'best_vars': best_vars}
+
+
+def _stage_selection(artifacts, params):
+    response_var = artifacts['response_var']
+    data_stationary = artifacts['data_features']
+    if response_var not in data_stationary.columns:
+        raise ValueError(f"{response_var} not found after transformations!")
+
+    Y = data_stationary[response_var]
+    X = data_stationary.drop(columns=[response_var])
+    if params['selection_method'] == 'stepwise':
+        return _select_stepwise(artifacts, params, Y, X)
+    if params['selection_method'] != 'hellwig':
+        raise ValueError(f"Unknown selection method: {params['selection_method']}")
+
+    print("\n9. Hellwig method - variable selection...")
+    hellwig_results = hellwig_method_bitmask(Y, X, top_k=params['hellwig_top_k'])
+
+    print("Best variable combinations (Hellwig method):")
+    for i, result in enumerate(hellwig_results[:5], 1):
+        print(f"{i}. {result['variables']} -> Capacity: {result['capacity']:.4f}")
+
+    comparison = fit_subsets_batch(data_stationary, hellwig_results[:params['compare_top_n']],
+                                   response_var, artifacts['data_test_features'])
+    print("\nTop Hellwig combinations compared by fit:")
+    print(comparison[['variables', 'r2', 'adj_r2', 'aic', 'bic', 'rmse_test']].to_string(index=False))
+
+    best_combination = hellwig_results[0]
+    best_vars = best_combination['var_list']
+    print(f"\nSelected variables for model: {best_vars}")
+    print(f"Hellwig capacity: {best_combination['capacity']:.4f}")
+    return {'hellwig_results': hellwig_results, 'comparison': comparison, 'best_vars': best_vars}
+
+
+def _stage_fit(artifacts, params):
+    print("\n10. Building econometric model...")
+    response_var = artifacts['response_var']
+    best_vars = artifacts['best_vars']
+    data_final = artifacts['data_features'][[response_var] + best_vars]
+    model, X_with_const = build_ols_model(data_final, response_var, best_vars)
+    return {'model': model, 'X_with_const': X_with_const}
+
+
+def _stage_state(artifacts, params):
+    if not params['save_state']:
+        return {}
+    if _lagged_vars(artifacts):
+        print("\nLagged regressors selected: pipeline state for incremental updates not saved")
+        return {}
+    # The state covers every row of the data file (test period included), so that
+    # --incremental only folds rows appended after this run
+    data_raw = pd.concat([artifacts['data_learning'], artifacts['data_test']])
+    data_log = pd.concat([artifacts['data_log'], artifacts['data_test_log']])
+    data_stationary = apply_diff_to_test_data(data_log, artifacts['diff_info'])[artifacts['data_stationary'].columns]
+    save_pipeline_state(init_pipeline_state(
+        data_raw, data_log, data_stationary, artifacts['diff_info'], artifacts['best_vars'],
+        artifacts['response_var'], params['max_diff']), params['state_path'])
+    return {}
+
+
+def _stage_diagnostics(artifacts, params):
+    from Functions.tests import run_diagnostics
+
+    return {'diagnostics': run_diagnostics(artifacts['model'])}
+
+
+def _report_diagnostics(artifacts):
+    from Functions.tests import print_diagnostics
+
+    print("\n11. Model diagnostics:")
+    print_diagnostics(artifacts['diagnostics'])
+
+    model = artifacts['model']
+    print("\n12. Parameter interpretation:")
+    for param_name, coef in model.params.items():
+        p_value = model.pvalues[param_name]
+        t_value = model.tvalues[param_name]
+
+        significance = ""
+        if p_value < 0.001:
+            significance = "***"
+        elif p_value < 0.01:
+            significance = "**"
+        elif p_value < 0.05:
+            significance = "*"
+        elif p_value < 0.1:
+            significance = "."
+
+        print(f"\n{param_name}:")
+        print(f"  Coefficient: {coef:.6f}")
+        print(f"  t-statistic: {t_value:.4f}")
+        print(f"  p-value: {p_value:.4f} {significance}")
+
+        if p_value < 0.05:
+            print(f"  Status: STATISTICALLY SIGNIFICANT")
+        else:
+            print(f"  Status: NOT STATISTICALLY SIGNIFICANT")
+
+
+def _stage_evaluation(artifacts, params):
+    import statsmodels.api as sm
+
+    response_var = artifacts['response_var']
+    best_vars = artifacts['best_vars']
+    data_test_final = artifacts['data_test_features']
+
+    missing_in_test = [col for col in best_vars if col not in data_test_final.columns]
+    if missing_in_test:
+        print(f"Warning: Missing variables in test data: {missing_in_test}")
+
+    X_test = data_test_final[best_vars]
+    X_test_with_const = sm.add_constant(X_test)
+    Y_test = data_test_final[response_var]
+
+    predictions = artifacts['model'].predict(X_test_with_const)
+
+    # Diebold-Mariano against the no-change forecast of the differenced response
+    evaluation = evaluate_forecasts(Y_test.to_numpy(), predictions.to_numpy()[None, :]).iloc[0]
+
+    metric_ci = coefficient_ci = None
+    if params['bootstrap_reps']:
+        bootstrap = {'n_boot': params['bootstrap_reps'], 'block_size': params['bootstrap_block'],
+                     'seed': params['bootstrap_seed']}
+        metric_ci = bootstrap_metric_ci(Y_test, predictions, **bootstrap)
+        coefficient_ci = bootstrap_coefficient_ci(artifacts['model'], **bootstrap)
+
+    return {'Y_test': Y_test, 'predictions': predictions,
+            'metrics': {name: evaluation[name] for name in ('mae', 'rmse', 'mape', 'smape')},
+            'direction_accuracy': evaluation['direction_accuracy'],
+            'dm_test': (evaluation['dm_stat'], evaluation['dm_pvalue']),
+            'metric_ci': metric_ci, 'coefficient_ci': coefficient_ci}
+
+
+def _report_evaluation(artifacts):
+    print("\n13. Out-of-sample model evaluation...")
+    metrics = artifacts['metrics']
+    print(f"\n=== OUT-OF-SAMPLE RESULTS (Test Set) ===")
+    print(f"MAE = {metrics['mae']:.6f}")
+    print(f"RMSE = {metrics['rmse']:.6f}")
+    if not np.isnan(metrics['mape']):
+        print(f"MAPE = {metrics['mape']:.2f}%")
+    else:
+        print("MAPE = NaN (very small D_CLOSE values)")
+    print(f"sMAPE = {metrics['smape']:.2f}%")
+    print(f"Directional accuracy = {artifacts['direction_accuracy']:.2%}")
+    dm_stat, dm_pvalue = artifacts['dm_test']
+    print(f"Diebold-Mariano vs no-change forecast: DM = {dm_stat:.4f}, p-value = {dm_pvalue:.4f}")
+
+    metric_ci = artifacts['metric_ci']
+    if metric_ci is not None:
+        print("\n95% block-bootstrap confidence intervals:")
+        for name, row in metric_ci.iterrows():
+            print(f"{name.upper():<6} [{row['lower']:.6f}, {row['upper']:.6f}]")
+        print("\nCoefficients:")
+        for name, row in artifacts['coefficient_ci'].iterrows():
+            print(f"{name:<10} {row['estimate']:.6f} [{row['lower']:.6f}, {row['upper']:.6f}]")
+
+
+def _stage_export(artifacts, params):
+    if not params['save_model']:
+        return {}
+    if _lagged_vars(artifacts):
+        print("\nLagged regressors selected: model artifact not saved (it supports contemporaneous regressors only)")
+        return {}
+    # History ends at the latest observation, test period included
+    data_raw = pd.concat([artifacts['data_learning'], artifacts['data_test']])
+    artifact = build_model_artifact(artifacts['model'].params, artifacts['diff_info'], data_raw,
+                                    artifacts['response_var'], params['max_diff'], artifacts['model'].resid)
+    save_model_artifact(artifact, params['model_path'])
+    print(f"\nModel artifact saved: {params['model_path']}")
+    return {'model_artifact': artifact}
+
+
+def _stage_heatmap(artifacts, params):
+    if params['plots']:
+        from Functions.plots_creation import plot_correlation_heatmap, set_plot_output
+
+        set_plot_output(params['plot_dpi'], params['plot_format'])
+        print("\nCreating correlation heatmap...")
+        plot_correlation_heatmap(artifacts['data_filtered'])
+    return {}
+
+
+def _stage_plots(artifacts, params):
+    if not params['plots']:
+        return {}
+    from Functions.plots_creation import plot_actual_vs_predicted, set_plot_output
+
+    set_plot_output(params['plot_dpi'], params['plot_format'])
+
+    print("\nCreating actual vs predicted plot...")
+    plot_actual_vs_predicted(artifacts['Y_test'], artifacts['predictions'])
+    return {}
+
+
+STAGES = [
+    Stage('load', _stage_load, params=('data_path', 'compact_dtype'), runtime=('data_cache',)),
+    Stage('correlation_filter', _stage_correlation_filter, ('load',), ('y_name', 'low_thr', 'high_thr')),
+    Stage('log_transform', _stage_log_transform, ('correlation_filter',), ('compact_dtype',)),
+    Stage('heatmap', _stage_heatmap, ('correlation_filter',), ('plots',), runtime=('plot_dpi', 'plot_format'),
+          cached=False),
+    Stage('stationarity', _stage_stationarity, ('log_transform',), runtime=('n_jobs',)),
+    Stage('differencing', _stage_differencing, ('log_transform', 'stationarity'),
+          ('y_name', 'max_diff', 'compact_dtype'), runtime=('n_jobs',)),
+    Stage('lags', _stage_lags, ('differencing',), ('max_lag', 'lag_vars'), cached=False),
+    Stage('selection', _stage_selection, ('differencing', 'lags'),
+          ('hellwig_top_k', 'compare_top_n', 'selection_method', 'stepwise_direction', 'stepwise_criterion')),
+    Stage('fit', _stage_fit, ('differencing', 'selection')),
+    Stage('state', _stage_state, ('load', 'log_transform', 'differencing', 'selection'), ('save_state', 'max_diff'),
+          runtime=('state_path',), cached=False),
+    Stage('diagnostics', _stage_diagnostics, ('fit',), report=_report_diagnostics),
+    Stage('evaluation', _stage_evaluation, ('differencing', 'selection', 'fit'),
+          ('bootstrap_reps', 'bootstrap_block', 'bootstrap_seed'), report=_report_evaluation),
+    Stage('export', _stage_export, ('load', 'differencing', 'fit'), ('save_model', 'max_diff'),
+          runtime=('model_path',), cached=False),
+    Stage('plots', _stage_plots, ('evaluation',), ('plots',), runtime=('plot_dpi', 'plot_format'), cached=False),
+]
+STAGE_NAMES = [stage.name for stage in STAGES]
+
+
+def _stage_key(stage, params, upstream_keys):
+    """Hash of the stage parameters and the keys of the stages it depends on"""
+    h = hashlib.sha256()
+    h.update(json.dumps([PIPELINE_VERSION, stage.name, params, upstream_keys], sort_keys=True).encode())
+    if 'data_path' in params:
+        h.update(data_file_key(params['data_path']).encode())
+    return h.hexdigest()[:32]
+
+
+def _write_artifact(path, outputs):
+    """Store stage outputs atomically"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(outputs, f)
+    os.replace(tmp_path, path)
+
+
+def _read_artifact(path):
+    """Stored stage outputs, or None if there are none (also when a concurrent prune removed them)"""
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _mtime(path):
+    try:
+        return path.stat().st_mtime
+    except FileNotFoundError:
+        return 0.0
+
+
+def prune_stage_cache(cache_dir=PIPELINE_CACHE_DIR, keep=STAGE_CACHE_KEEP):
+    """Keep only the keep most recent cache entries of every stage"""
+    for name in STAGE_NAMES:
+        entries = sorted(Path(cache_dir).glob(f"{name}-{'[0-9a-f]' * 32}.pkl"), key=_mtime)
+        for stale in entries[:-keep]:
+            stale.unlink(missing_ok=True)
+
+
+def run_pipeline(config=None, from_stage=None, force=(), cache_dir=PIPELINE_CACHE_DIR, until=None):
+    """
+    Run the pipeline as a chain of memoized stages
+    Each stage's output is cached on disk under a key derived from its parameters
+    and the keys of its inputs, so only stages downstream of a change are recomputed.
+    from_stage recomputes that stage and everything after it; force lists stages
+    to recompute regardless of the cache ('all' for every stage); the run stops
+    after the stage named by until. Old cache entries are pruned at the end unless
+    config['prune_cache'] is off (batch workers share the cache and prune once after the batch).
+    With config['headless'] figures render in a background pool while later stages run;
+    the previous plot backend and settings are restored when the run ends.
+    Printed output goes through the "econometric" logger (to stdout unless it was
+    configured with handlers of its own, see configure_logging); per-stage timings, memory
+    and key outputs are collected into artifacts['run_report'] (and config['report_path'])
+    """
+    config = {**DEFAULT_CONFIG, **(config or {})}
+    ensure_logging()
+    for name in [from_stage, until, *force]:
+        if name is not None and name not in STAGE_NAMES + ['all']:
+            raise ValueError(f"Unknown stage: {name}")
+    stages = STAGES[:STAGE_NAMES.index(until) + 1] if until is not None else STAGES
+    forced = set(STAGE_NAMES) if 'all' in force else set(force)
+    if from_stage is not None:
+        forced.update(STAGE_NAMES[STAGE_NAMES.index(from_stage):])
+
+    recorder = RunRecorder(config, config['trace_memory'])
+    artifacts = {}
+    keys = {}
+    headless = config['headless'] and config['plots']
+    rendering = contextlib.nullcontext()
+    if headless:
+        from Functions.plots_creation import headless_rendering
+        rendering = headless_rendering(config['plot_dpi'], config['plot_format'])
+
+    with rendering:
+        for stage in stages:
+            params = {name: config[name] for name in stage.params}
+            key = _stage_key(stage, params, [keys[name] for name in stage.depends_on])
+            path = Path(cache_dir) / f"{stage.name}-{key}.pkl"
+
+            with recorder.stage(stage.name) as record, console_to_log():
+                outputs = _read_artifact(path) if stage.cached and stage.name not in forced else None
+                if outputs is not None:
+                    record['cached'] = True
+                    logger.info(f"[cached] {stage.name}")
+                else:
+                    runtime = {name: config[name] for name in stage.runtime}
+                    outputs = stage.compute(artifacts, {**params, **runtime})
+                    if stage.cached:
+                        _write_artifact(path, outputs)
+
+                artifacts.update(outputs)
+                keys[stage.name] = key
+                record['outputs'] = summarize_value(outputs)
+                if stage.report is not None:
+                    stage.report(artifacts)
+
+        if headless:
+            from Functions.plots_creation import wait_for_plots
+            with console_to_log():
+                wait_for_plots()
+
+    if config['prune_cache']:
+        prune_stage_cache(cache_dir)
+    if config['report_path']:
+        recorder.write(config['report_path'])
+    artifacts['run_report'] = recorder.report()
+    return artifacts
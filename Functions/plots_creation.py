@@ -1,7 +1,21 @@
 import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
+import matplotlib
 from matplotlib import pyplot as plt
 import seaborn as sns
+from Functions.correlation import correlation_matrix
+
+__all__ = ['ANNOTATION_LIMIT', 'ensure_plots_directory', 'save_plot', 'set_plot_output', 'headless_rendering',
+           'wait_for_plots', 'plot_correlation_heatmap', 'plot_actual_vs_predicted']
+
+# Heatmaps with more variables than this skip per-cell annotations by default
+ANNOTATION_LIMIT = 20
+
+_RENDER_CONFIG = {'headless': False, 'dpi': 300, 'format': 'png', 'max_workers': None}
+_RENDER_STATE = {'executor': None, 'futures': []}
+
 
 def ensure_plots_directory():
     """Create plots directory if it doesn't exist"""
@@ -9,28 +23,57 @@ def ensure_plots_directory():
     plots_dir.mkdir(exist_ok=True)
     return plots_dir
 
-def save_plot(filename, dpi=300, bbox_inches='tight'):
-    """Save plot to Plots directory"""
+def save_plot(filename, dpi=None, bbox_inches='tight'):
+    """Save plot to Plots directory, in the resolution and format set by set_plot_output"""
     plots_dir = ensure_plots_directory()
-    filepath = plots_dir / filename
-    plt.savefig(filepath, dpi=dpi, bbox_inches=bbox_inches)
+    filepath = plots_dir / Path(filename).with_suffix(f".{_RENDER_CONFIG['format']}")
+    plt.savefig(filepath, dpi=dpi or _RENDER_CONFIG['dpi'], bbox_inches=bbox_inches)
     print(f"Plot saved: {filepath}")
 
 
-def plot_correlation_heatmap(data):
-    """Create and save correlation heatmap"""
+def set_plot_output(dpi=300, fmt='png'):
+    """Resolution and file format of saved plots, headless or not"""
+    _RENDER_CONFIG.update({'dpi': dpi, 'format': fmt})
+
+
+@contextmanager
+def headless_rendering(dpi=300, fmt='png', max_workers=None):
+    """
+    Non-interactive rendering within the with block
+    Forces the Agg backend; plot functions then queue figure specifications
+    that a background process pool renders while the pipeline continues
+    (collect them with wait_for_plots). On exit the render pool is shut down
+    and the previous backend and render settings are restored
+    """
+    backend = matplotlib.get_backend()
+    config = dict(_RENDER_CONFIG)
+    matplotlib.use('Agg', force=True)
+    set_plot_output(dpi, fmt)
+    _RENDER_CONFIG.update({'headless': True, 'max_workers': max_workers})
+    try:
+        yield
+    finally:
+        if _RENDER_STATE['executor'] is not None:
+            _RENDER_STATE['executor'].shutdown()
+        _RENDER_STATE.update({'executor': None, 'futures': []})
+        _RENDER_CONFIG.update(config)
+        if backend.lower() != 'agg':
+            matplotlib.use(backend, force=True)
+
+
+def _draw_correlation_heatmap(corr, annotate=None):
+    """Draw a correlation heatmap; annotate=None annotates only small matrices"""
+    if annotate is None:
+        annotate = len(corr) <= ANNOTATION_LIMIT
     plt.figure(figsize=(10, 8))
-    correlation_matrix = data.corr()
-    sns.heatmap(correlation_matrix, annot=True, cmap='coolwarm', center=0,
-                square=True, linewidths=0.5)
+    sns.heatmap(corr, annot=annotate, cmap='coolwarm', center=0,
+                square=True, linewidths=0.5 if annotate else 0)
     plt.title('Correlation Matrix of Selected Variables', fontsize=14, fontweight='bold')
     plt.tight_layout()
 
-    save_plot("correlation_heatmap.png")
-    plt.show()
 
-def plot_actual_vs_predicted(Y_test, predictions):
-    """Create and save actual vs predicted comparison"""
+def _draw_actual_vs_predicted(Y_test, predictions):
+    """Draw actual vs predicted values and prediction residuals"""
     plt.figure(figsize=(12, 8))
 
     plt.subplot(2, 1, 1)
@@ -53,6 +96,62 @@ def plot_actual_vs_predicted(Y_test, predictions):
 
     plt.tight_layout()
 
-    save_plot("actual_vs_predicted.png")
+
+_DRAWERS = {
+    'correlation_heatmap': _draw_correlation_heatmap,
+    'actual_vs_predicted': _draw_actual_vs_predicted,
+}
+
+
+def _render_figure(kind, kwargs, filepath, dpi):
+    """Render one figure specification to a file in a worker process"""
+    matplotlib.use('Agg', force=True)
+    _DRAWERS[kind](**kwargs)
+    plt.savefig(filepath, dpi=dpi, bbox_inches='tight')
+    plt.close('all')
+    return filepath
+
+
+def _submit_figure(kind, kwargs, filename):
+    """Queue a figure specification for background rendering"""
+    if _RENDER_STATE['executor'] is None:
+        _RENDER_STATE['executor'] = ProcessPoolExecutor(max_workers=_RENDER_CONFIG['max_workers'])
+    filepath = ensure_plots_directory() / Path(filename).with_suffix(f".{_RENDER_CONFIG['format']}")
+    future = _RENDER_STATE['executor'].submit(_render_figure, kind, kwargs, filepath, _RENDER_CONFIG['dpi'])
+    _RENDER_STATE['futures'].append(future)
+    return future
+
+
+def wait_for_plots():
+    """Block until all queued figures are rendered and shut the render pool down"""
+    paths = []
+    for future in _RENDER_STATE['futures']:
+        filepath = future.result()
+        print(f"Plot saved: {filepath}")
+        paths.append(filepath)
+    _RENDER_STATE['futures'] = []
+    if _RENDER_STATE['executor'] is not None:
+        _RENDER_STATE['executor'].shutdown()
+        _RENDER_STATE['executor'] = None
+    return paths
+
+
+def plot_correlation_heatmap(data, annotate=None):
+    """Create and save correlation heatmap"""
+    corr = correlation_matrix(data)
+    if _RENDER_CONFIG['headless']:
+        return _submit_figure('correlation_heatmap', {'corr': corr, 'annotate': annotate}, "correlation_heatmap.png")
+
+    _draw_correlation_heatmap(corr, annotate)
+    save_plot("correlation_heatmap.png")
     plt.show()
 
+def plot_actual_vs_predicted(Y_test, predictions):
+    """Create and save actual vs predicted comparison"""
+    if _RENDER_CONFIG['headless']:
+        return _submit_figure('actual_vs_predicted', {'Y_test': Y_test, 'predictions': predictions},
+                              "actual_vs_predicted.png")
+
+    _draw_actual_vs_predicted(Y_test, predictions)
+    save_plot("actual_vs_predicted.png")
+    plt.show()
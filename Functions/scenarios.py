@@ -0,0 +1,90 @@
+import numpy as np
+
+__all__ = ['SCENARIO_CHUNK_SIZE', 'scenario_regressors', 'iter_scenario_chunks', 'simulate_scenarios']
+
+# Scenarios transformed and multiplied per chunk
+SCENARIO_CHUNK_SIZE = 1024
+
+
+def scenario_regressors(artifact, levels):
+    """
+    Model variables of (scenarios, horizon, regressors) raw levels in the order of
+    artifact.raw_columns[1:]: logs, lag-differenced against the stored history
+    for the first horizon steps
+    """
+    history = np.asarray(artifact.history, dtype=np.float64)[:, 1:]
+    n_history = len(history)
+    levels = np.concatenate([np.broadcast_to(history, (len(levels),) + history.shape), levels], axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        logs = np.log(np.where(levels > 0, levels, np.nan))
+
+    orders = artifact.orders[1:]
+    transformed = logs[:, n_history:].copy()
+    for order in np.unique(orders[orders > 0]):
+        columns = np.flatnonzero(orders == order)
+        transformed[:, :, columns] -= logs[:, n_history - order:logs.shape[1] - order, columns]
+    return transformed
+
+
+def _response_levels(artifact, forecast):
+    """Response levels of forecast paths (..., horizon) of the differenced response, chained from the history"""
+    order = int(artifact.orders[0])
+    if order == 0:
+        return np.exp(forecast)
+    base = np.log(np.asarray(artifact.history, dtype=np.float64)[:, 0])
+    log_level = np.empty_like(forecast)
+    for residue in range(order):
+        steps = slice(residue, forecast.shape[-1], order)
+        log_level[..., steps] = base[len(base) - order + residue] + np.cumsum(forecast[..., steps], axis=-1)
+    return np.exp(log_level)
+
+
+def iter_scenario_chunks(artifact, scenarios, columns=None, n_draws=0, seed=None, chunk_size=SCENARIO_CHUNK_SIZE):
+    """
+    Push (scenarios, horizon, regressors) raw-level paths through the model, chunk by chunk
+    columns names the regressors along the last axis (default artifact.raw_columns[1:]).
+    With n_draws, residuals resampled from artifact.residuals are added to the
+    differenced response, n_draws noisy paths per scenario.
+    Yields (start, paths): paths maps response_var to the differenced forecasts and
+    response to the levels, of shape (chunk, horizon), or (chunk, n_draws, horizon)
+    with noise
+    """
+    scenarios = np.asarray(scenarios, dtype=np.float64)
+    if scenarios.ndim != 3:
+        raise ValueError("scenarios must have shape (scenarios, horizon, regressors)")
+    regressors = artifact.raw_columns[1:]
+    if columns is not None:
+        missing = [col for col in regressors if col not in columns]
+        if missing:
+            raise ValueError(f"Scenarios lack model regressors: {missing}")
+        scenarios = scenarios[:, :, [list(columns).index(col) for col in regressors]]
+    elif scenarios.shape[2] != len(regressors):
+        raise ValueError(f"Expected {len(regressors)} regressors ({regressors}), got {scenarios.shape[2]}")
+
+    residuals = np.asarray(artifact.residuals, dtype=np.float64)
+    if n_draws and not len(residuals):
+        raise ValueError("The model artifact holds no residuals to resample")
+    rng = np.random.default_rng(seed)
+    coefficients = np.asarray(artifact.coefficients)
+
+    for start in range(0, len(scenarios), chunk_size):
+        chunk = scenarios[start:start + chunk_size]
+        forecast = coefficients[0] + scenario_regressors(artifact, chunk) @ coefficients[1:]
+        if n_draws:
+            noise = residuals[rng.integers(0, len(residuals), size=(len(chunk), n_draws, chunk.shape[1]))]
+            forecast = forecast[:, None, :] + noise
+        yield start, {artifact.response_var: forecast, artifact.response: _response_levels(artifact, forecast)}
+
+
+def simulate_scenarios(artifact, scenarios, columns=None, n_draws=0, seed=None, chunk_size=SCENARIO_CHUNK_SIZE):
+    """
+    Forecast paths for a whole scenario set, collected from iter_scenario_chunks
+    Returns a dict of arrays keyed by response_var and response
+    """
+    scenarios = np.asarray(scenarios)
+    shape = (len(scenarios), n_draws, scenarios.shape[1]) if n_draws else scenarios.shape[:2]
+    result = {artifact.response_var: np.empty(shape), artifact.response: np.empty(shape)}
+    for start, paths in iter_scenario_chunks(artifact, scenarios, columns, n_draws, seed, chunk_size):
+        for name, values in paths.items():
+            result[name][start:start + len(values)] = values
+    return result
@@ -1,19 +1,142 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
 import pandas as pd
-from statsmodels.tsa.stattools import adfuller, kpss
 import warnings
 
+__all__ = ['STATIONARITY_CACHE_DIR', 'STATIONARITY_CACHE_SIZE', 'STATIONARITY_TESTS', 'MIN_OBSERVATIONS',
+           'adf_batch', 'check_stationarity', 'batch_stationarity', 'analyze_stationarity', 'differencing_orders',
+           'remove_nonstationarity', 'apply_diff_to_test_data']
+
+STATIONARITY_CACHE_DIR = Path(".cache") / "stationarity"
+STATIONARITY_TESTS = {
+    'adf': {'autolag': 'AIC', 'regression': 'c'},
+    'kpss': {'nlags': 'auto'},
+}
+MIN_OBSERVATIONS = 20
+# Implementation version of each test, part of the cache key; bump it when results change
+_TEST_VERSIONS = {'adf': 2, 'kpss': 1}
+STATIONARITY_CACHE_SIZE = 4096
+
+# In-process LRU layer of the content-addressed test cache, backed by the files in STATIONARITY_CACHE_DIR
+_TEST_CACHE = OrderedDict()
+
+
+def _adf_design(x, lags, regression):
+    """
+    ADF regression design for a (n_series, T) array with a given number of lags
+    Columns are [deterministic terms, lagged level, lagged differences 1..lags],
+    response is the differenced series trimmed to the same sample
+    """
+    xdiff = np.diff(x, axis=1)
+    n_series = x.shape[0]
+    nobs = xdiff.shape[1] - lags
+
+    columns = []
+    if regression in ('c', 'ct'):
+        columns.append(np.ones((n_series, nobs)))
+    if regression == 'ct':
+        columns.append(np.broadcast_to(np.arange(1, nobs + 1, dtype=np.float64), (n_series, nobs)))
+    columns.append(x[:, lags:lags + nobs])
+    for j in range(1, lags + 1):
+        columns.append(xdiff[:, lags - j:lags - j + nobs])
+
+    return np.stack(columns, axis=2), xdiff[:, lags:]
+
+
+def adf_batch(x, maxlag=None, regression='c', autolag='AIC'):
+    """
+    Augmented Dickey-Fuller test for many equal-length series at once
+    x is a 2-D array (n_series, T) or a DataFrame with one series per column.
+    Lag selection fits every nested lag model from a single QR of the full
+    design, then the ADF statistic is computed per chosen lag order.
+    Mirrors statsmodels' adfuller; p-values use MacKinnon's tables
+    """
+    index = None
+    if isinstance(x, pd.DataFrame):
+        index = x.columns
+        x = x.to_numpy(dtype=np.float64).T
+    x = np.atleast_2d(np.asarray(x, dtype=np.float64))
+    if np.isnan(x).any():
+        raise ValueError("Series passed to adf_batch must not contain NaN")
+    if regression not in ('n', 'c', 'ct'):
+        raise ValueError(f"Unsupported regression: {regression}")
+    if autolag not in ('AIC', 'BIC', None):
+        raise ValueError(f"Unsupported autolag: {autolag}")
+
+    n_series, nobs = x.shape
+    ntrend = len(regression) if regression != 'n' else 0
+    if maxlag is None:
+        maxlag = int(np.ceil(12.0 * np.power(nobs / 100.0, 1 / 4.0)))
+        maxlag = min(nobs // 2 - ntrend - 1, maxlag)
+        if maxlag < 0:
+            raise ValueError("sample size is too short to use selected regression component")
+    elif maxlag > nobs // 2 - ntrend - 1:
+        raise ValueError("maxlag must be less than (nobs/2 - 1 - ntrend)")
+
+    if autolag is None:
+        lags = np.full(n_series, maxlag)
+    else:
+        # All nested models share the maxlag sample, so RSS of the first m
+        # columns is |y|^2 minus the first m squared entries of Q'y
+        design, y = _adf_design(x, maxlag, regression)
+        q, _ = np.linalg.qr(design)
+        qty = np.einsum('snp,sn->sp', q, y)
+        ssr_all = np.einsum('sn,sn->s', y, y)[:, None] - np.cumsum(qty ** 2, axis=1)
+
+        startlag = ntrend + 1
+        n_params = np.arange(startlag, startlag + maxlag + 1)
+        ssr = np.maximum(ssr_all[:, n_params - 1], np.finfo(np.float64).tiny)
+        n = y.shape[1]
+        neg2llf = n * (np.log(2 * np.pi) + np.log(ssr / n) + 1)
+        penalty = 2.0 if autolag == 'AIC' else np.log(n)
+        lags = np.argmin(neg2llf + penalty * n_params, axis=1)
+
+    statistics = np.empty(n_series)
+    n_used = np.empty(n_series, dtype=int)
+    for lag in np.unique(lags):
+        members = np.flatnonzero(lags == lag)
+        design, y = _adf_design(x[members], int(lag), regression)
+        q, r = np.linalg.qr(design)
+        beta = np.linalg.solve(r, np.einsum('snp,sn->sp', q, y)[:, :, None])[:, :, 0]
+        resid = y - np.einsum('snp,sp->sn', design, beta)
+        df_resid = y.shape[1] - design.shape[2]
+        sigma2 = np.einsum('sn,sn->s', resid, resid) / df_resid
+        r_inv = np.linalg.inv(r)
+        level = ntrend  # column of the lagged level
+        se = np.sqrt(sigma2 * np.sum(r_inv[:, level, :] ** 2, axis=1))
+        statistics[members] = beta[:, level] / se
+        n_used[members] = y.shape[1]
+
+    from statsmodels.tsa.adfvalues import mackinnonp
+
+    p_values = [mackinnonp(stat, regression=regression, N=1) for stat in statistics]
+    return pd.DataFrame({
+        'statistic': statistics,
+        'p_value': p_values,
+        'lags': lags.astype(int),
+        'n_obs': n_used,
+    }, index=index)
+
+
 def check_stationarity(series, alpha=0.05):
     """
     Check stationarity using ADF and KPSS tests
     Series is stationary when: (ADF p-value < alpha) AND (KPSS p-value > alpha)
     """
+    from statsmodels.tsa.stattools import kpss
+
     series = pd.Series(series).dropna()
     if len(series) < 20:
         return False
 
     try:
-        adf_result = adfuller(series, autolag='AIC')
-        adf_p_value = adf_result[1]
+        adf_result = adf_batch(series.to_numpy(dtype=float)[None, :], autolag='AIC')
+        adf_p_value = adf_result['p_value'].iloc[0]
         adf_test_result = adf_p_value < alpha
         with warnings.catch_warnings():
             warnings.filterwarnings("ignore", message="The test statistic is outside of the range")
@@ -28,14 +151,169 @@ def check_stationarity(series, alpha=0.05):
         return False
 
 
-def analyze_stationarity(data):
+def _test_key(values, test, params):
+    """Content hash of the series bytes, the test parameters and the test implementation version"""
+    h = hashlib.sha256()
+    h.update(f"{test}:{_TEST_VERSIONS[test]}".encode())
+    h.update(json.dumps(params, sort_keys=True).encode())
+    h.update(np.ascontiguousarray(values, dtype=np.float64).tobytes())
+    return h.hexdigest()
+
+
+def _run_adf(x, params):
+    """Run adf_batch on a (n_series, T) array and return one result per series"""
+    table = adf_batch(x, **params)
+    return [{'statistic': float(row.statistic), 'p_value': float(row.p_value), 'lags': int(row.lags),
+             'error': None} for row in table.itertuples()]
+
+
+def _run_adf_single(values, params):
+    """Run ADF on one series, returning a failure as an error result"""
+    try:
+        return _run_adf(values[None, :], params)[0]
+    except Exception as e:
+        return {'statistic': np.nan, 'p_value': np.nan, 'lags': -1, 'error': str(e)}
+
+
+def _run_kpss(values, params):
+    """Run a single KPSS test and return its statistic, p-value and lags"""
+    from statsmodels.tsa.stattools import kpss
+
+    try:
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore", message="The test statistic is outside of the range")
+            statistic, p_value, lags = kpss(values, **params)[:3]
+        return {'statistic': float(statistic), 'p_value': float(p_value), 'lags': int(lags), 'error': None}
+    except Exception as e:
+        return {'statistic': np.nan, 'p_value': np.nan, 'lags': -1, 'error': str(e)}
+
+
+def _remember(key, result):
+    _TEST_CACHE[key] = result
+    _TEST_CACHE.move_to_end(key)
+    while len(_TEST_CACHE) > STATIONARITY_CACHE_SIZE:
+        _TEST_CACHE.popitem(last=False)
+
+
+def _cached_result(key, cache_dir):
+    """Look a test result up in memory, then on disk"""
+    if key in _TEST_CACHE:
+        _TEST_CACHE.move_to_end(key)
+        return _TEST_CACHE[key]
+    if cache_dir is not None:
+        path = Path(cache_dir) / f"{key}.json"
+        if path.exists():
+            result = json.loads(path.read_text())
+            _remember(key, result)
+            return result
+    return None
+
+
+def _store_result(key, result, cache_dir):
+    """Save a test result in memory and on disk; failed tests are not cached, so they are retried"""
+    if result['error'] is not None:
+        return
+    _remember(key, result)
+    if cache_dir is not None:
+        cache_dir = Path(cache_dir)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        path = cache_dir / f"{key}.json"
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(result))
+        os.replace(tmp_path, path)
+
+
+def _grid_series(data, diff_orders):
+    """Yield (variable, diff order, values) for every cell of the series x order grid"""
+    for col in data.columns:
+        for order in diff_orders:
+            series = data[col] if order == 0 else data[col].diff(order)
+            yield col, order, series.dropna().to_numpy(dtype=np.float64)
+
+
+def batch_stationarity(data, diff_orders=(0,), alpha=0.05, n_jobs=None, cache_dir=STATIONARITY_CACHE_DIR):
+    """
+    Run ADF and KPSS for every column and differencing order of data
+    Tests are spread over a process pool and cached by content hash,
+    so re-checking unchanged series is almost free
+    Returns one row per (variable, diff_order) with statistics and p-values
+    (an empty table with the same columns when data has no columns)
+    """
+    cells = list(_grid_series(data, diff_orders))
+
+    keys = {}
+    results = {}
+    pending = {}
+    for col, order, values in cells:
+        if len(values) < MIN_OBSERVATIONS:
+            continue
+        for test, params in STATIONARITY_TESTS.items():
+            key = _test_key(values, test, params)
+            keys[(col, order, test)] = key
+            if key not in results and key not in pending:
+                cached = _cached_result(key, cache_dir)
+                if cached is None:
+                    pending[key] = (test, values, params)
+                else:
+                    results[key] = cached
+
+    # ADF runs natively in one batch per series length
+    adf_pending = {}
+    for key, (test, values, params) in list(pending.items()):
+        if test == 'adf':
+            adf_pending.setdefault(len(values), []).append((key, values, params))
+            del pending[key]
+    for group in adf_pending.values():
+        try:
+            computed = _run_adf(np.vstack([values for _, values, _ in group]), group[0][2])
+        except Exception:
+            # One bad series fails the whole batch; test them one by one to isolate it
+            computed = [_run_adf_single(values, params) for _, values, params in group]
+        for (key, _, _), result in zip(group, computed):
+            results[key] = result
+            _store_result(key, result, cache_dir)
+
+    # KPSS is spread over the worker pool
+    if pending:
+        n_jobs = n_jobs or os.cpu_count() or 1
+        tasks = list(pending.items())
+        if n_jobs == 1 or len(tasks) == 1:
+            computed = [_run_kpss(values, params) for _, (_, values, params) in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=min(n_jobs, len(tasks))) as executor:
+                computed = list(executor.map(_run_kpss, *zip(*[(values, params) for _, (_, values, params) in tasks])))
+        for (key, _), result in zip(tasks, computed):
+            results[key] = result
+            _store_result(key, result, cache_dir)
+
+    rows = []
+    for col, order, values in cells:
+        row = {'variable': col, 'diff_order': order, 'n_obs': len(values)}
+        for test in STATIONARITY_TESTS:
+            result = results.get(keys.get((col, order, test)))
+            if result is None:
+                result = {'statistic': np.nan, 'p_value': np.nan, 'lags': -1, 'error': 'too few observations'}
+            row[f'{test}_stat'] = result['statistic']
+            row[f'{test}_pvalue'] = result['p_value']
+            row[f'{test}_lags'] = result['lags']
+            if result['error'] is not None and len(values) >= MIN_OBSERVATIONS:
+                print(f"Error in {test.upper()} test for {col} (diff order {order}): {result['error']}")
+        row['stationary'] = bool(row['adf_pvalue'] < alpha and row['kpss_pvalue'] > alpha)
+        rows.append(row)
+
+    columns = ['variable', 'diff_order', 'n_obs'] + [f'{test}_{field}' for test in STATIONARITY_TESTS
+                                                     for field in ('stat', 'pvalue', 'lags')] + ['stationary']
+    return pd.DataFrame(rows, columns=columns).astype({'stationary': bool})
+
+
+def analyze_stationarity(data, n_jobs=None):
     """Analyze stationarity for all variables"""
+    table = batch_stationarity(data, n_jobs=n_jobs)
     results = {}
     non_stationary_vars = []
     stationary_vars = []
 
-    for col in data.columns:
-        is_stationary = check_stationarity(data[col])
+    for col, is_stationary in zip(table['variable'], table['stationary']):
         results[col] = "Stationary" if is_stationary else "Non-stationary"
 
         if is_stationary:
@@ -50,36 +328,34 @@ def analyze_stationarity(data):
     return non_stationary_vars, stationary_vars
 
 
-def remove_nonstationarity(data, non_stationary_vars, max_diff=2):
-    """Remove non-stationarity through differencing"""
-    transformed_data = {}
+def differencing_orders(data, non_stationary_vars, max_diff=2, n_jobs=None):
+    """
+    diff_info of remove_nonstationarity: the lowest order up to max_diff that makes each
+    non-stationary variable stationary (max_diff if none does), 0 for the other columns
+    """
     diff_info = {}
-
-    # Copy stationary variables unchanged
     for col in data.columns:
         if col not in non_stationary_vars:
             diff_info[col] = {'order': 0, 'name': col}
-            transformed_data[col] = data[col]
 
-    # Difference non-stationary variables
-    for var_name in non_stationary_vars:
-        original_series = data[var_name]
-        order = 0
-
-        for i in range(1, max_diff + 1):
-            test_series = original_series.diff(i).dropna()
-            if check_stationarity(test_series):
-                order = i
-                current_series = original_series.diff(i)
-                break
-
-        if order == 0:
-            order = max_diff
-            current_series = original_series.diff(max_diff)
+    # Test every candidate differencing order in one batch
+    table = batch_stationarity(data[list(non_stationary_vars)], diff_orders=range(1, max_diff + 1), n_jobs=n_jobs)
+    stationary_orders = table[table['stationary']].groupby('variable')['diff_order'].min()
 
+    for var_name in non_stationary_vars:
+        order = int(stationary_orders.get(var_name, max_diff))
         new_name = f"D{order}_{var_name}" if order > 1 else f"D_{var_name}"
         diff_info[var_name] = {'order': order, 'name': new_name}
-        transformed_data[new_name] = current_series
+    return diff_info
+
+
+def remove_nonstationarity(data, non_stationary_vars, max_diff=2, n_jobs=None):
+    """Remove non-stationarity through differencing"""
+    diff_info = differencing_orders(data, non_stationary_vars, max_diff, n_jobs)
+    transformed_data = {}
+    for var_name, info in diff_info.items():
+        order = info['order']
+        transformed_data[info['name']] = data[var_name] if order == 0 else data[var_name].diff(order)
 
     result_df = pd.DataFrame(transformed_data)
     result_df = result_df.dropna()
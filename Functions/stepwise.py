@@ -0,0 +1,188 @@
+import numpy as np
+
+__all__ = ['STEPWISE_CRITERIA', 'STEPWISE_DIRECTIONS', 'stepwise_selection']
+
+STEPWISE_CRITERIA = ('aic', 'bic', 'rmse_test')
+STEPWISE_DIRECTIONS = ('forward', 'backward', 'both')
+
+# Candidates whose residual variance after projection falls below this share of
+# their own sum of squares are treated as collinear with the current model
+COLLINEARITY_TOL = 1e-10
+
+
+def _solve_upper(R, b, transpose=False):
+    """Triangular solve with the upper Cholesky factor (R^T x = b when transpose)"""
+    from scipy.linalg import solve_triangular
+    return solve_triangular(R, b, trans='T' if transpose else 'N', lower=False)
+
+
+def _chol_append(R, g, g_jj):
+    """Cholesky factor of [[G, g], [g^T, g_jj]] from the factor R of G in O(p^2)"""
+    r = _solve_upper(R, g, transpose=True)
+    p = len(R)
+    R_new = np.zeros((p + 1, p + 1))
+    R_new[:p, :p] = R
+    R_new[:p, p] = r
+    R_new[p, p] = np.sqrt(g_jj - r @ r)
+    return R_new
+
+
+def _chol_delete(R, k):
+    """Cholesky factor after deleting row/column k, restored with Givens rotations in O(p^2)"""
+    R = np.delete(R, k, axis=1)
+    for i in range(k, R.shape[1]):
+        a, b = R[i, i], R[i + 1, i]
+        radius = np.hypot(a, b)
+        c, s = a / radius, b / radius
+        rows = R[[i, i + 1], i:]
+        R[i, i:] = c * rows[0] + s * rows[1]
+        R[i + 1, i:] = -s * rows[0] + c * rows[1]
+    return R[:-1]
+
+
+class _StepwiseState:
+    """Selected columns of the Gram matrix with the Cholesky factor of their block"""
+
+    def __init__(self, G, c, yy, n, columns):
+        self.G, self.c, self.yy, self.n = G, c, yy, n
+        self.columns = [0]  # the constant
+        self.R = np.sqrt(G[:1, :1])
+        for j in columns:
+            self.add(j)
+
+    def ssr(self):
+        w = _solve_upper(self.R, self.c[self.columns], transpose=True)
+        return self.yy - w @ w
+
+    def beta(self):
+        w = _solve_upper(self.R, self.c[self.columns], transpose=True)
+        return _solve_upper(self.R, w)
+
+    def add(self, j):
+        self.R = _chol_append(self.R, self.G[self.columns, j], self.G[j, j])
+        self.columns.append(j)
+
+    def remove(self, j):
+        self.R = _chol_delete(self.R, self.columns.index(j))
+        self.columns.remove(j)
+
+    def addition_candidates(self, candidates, Z_test=None, y_test=None):
+        """SSR (and test RMSE) after adding each candidate, from one triangular solve for all of them"""
+        cols = self.columns
+        w = _solve_upper(self.R, self.c[cols], transpose=True)
+        r = _solve_upper(self.R, self.G[np.ix_(cols, candidates)], transpose=True)
+        d2 = self.G[candidates, candidates] - np.einsum('pm,pm->m', r, r)
+        valid = d2 > COLLINEARITY_TOL * self.G[candidates, candidates]
+        d = np.sqrt(np.where(valid, d2, 1.0))
+        w_new = (self.c[candidates] - r.T @ w) / d
+        ssr = np.where(valid, self.yy - w @ w - w_new ** 2, np.nan)
+
+        rmse = None
+        if Z_test is not None:
+            beta = _solve_upper(self.R, w)
+            beta_new = w_new / d
+            u = _solve_upper(self.R, r)
+            base = Z_test[:, cols] @ beta
+            predictions = base[:, None] + (Z_test[:, candidates] - Z_test[:, cols] @ u) * beta_new
+            rmse = np.where(valid, np.sqrt(np.mean((y_test[:, None] - predictions) ** 2, axis=0)), np.nan)
+        return ssr, rmse
+
+    def removal_candidates(self, Z_test=None, y_test=None):
+        """SSR (and test RMSE) after removing each selected regressor (never the constant)"""
+        R_inv = _solve_upper(self.R, np.eye(len(self.R)))
+        G_inv = R_inv @ R_inv.T
+        beta = self.beta()
+        diag = np.diag(G_inv)
+        ssr = (self.yy - beta @ self.c[self.columns]) + beta ** 2 / diag
+
+        rmse = None
+        if Z_test is not None:
+            B = beta[:, None] - G_inv * (beta / diag)[None, :]
+            predictions = Z_test[:, self.columns] @ B
+            rmse = np.sqrt(np.mean((y_test[:, None] - predictions) ** 2, axis=0))
+            rmse = rmse[1:]
+        return ssr[1:], rmse
+
+
+def _score(ssr, rmse, n, p, criterion):
+    """Criterion value of models with p parameters (constant included)"""
+    if criterion == 'rmse_test':
+        return rmse
+    neg2llf = n * (np.log(2 * np.pi) + np.log(ssr / n) + 1)
+    return neg2llf + (2 if criterion == 'aic' else np.log(n)) * p
+
+
+def stepwise_selection(y, X, direction='forward', criterion='aic', X_test=None, y_test=None, max_vars=None):
+    """
+    Stepwise OLS variable selection on AIC, BIC or out-of-sample RMSE
+    direction is 'forward' (start empty, add), 'backward' (start full, remove)
+    or 'both' (each step takes the better of the best addition and removal).
+    X'X and X'y are computed once; every move updates the Cholesky factor of the
+    selected block in O(p^2) and all candidate moves are scored together, so no
+    model is refitted. criterion='rmse_test' needs X_test and y_test.
+    Returns the selection path best first, in the result format of the Hellwig methods:
+    dicts with 'variables', 'var_list', 'score', 'criterion', 'step' and 'action'
+    """
+    if direction not in STEPWISE_DIRECTIONS:
+        raise ValueError(f"Unknown direction: {direction}")
+    if criterion not in STEPWISE_CRITERIA:
+        raise ValueError(f"Unknown criterion: {criterion}")
+    if criterion == 'rmse_test' and (X_test is None or y_test is None):
+        raise ValueError("criterion='rmse_test' needs X_test and y_test")
+
+    all_vars = list(X.columns)
+    y_values = np.asarray(y, dtype=np.float64)
+    Z = np.column_stack([np.ones(len(y_values)), X.to_numpy(dtype=np.float64)])
+    n = len(y_values)
+    G = Z.T @ Z
+    c = Z.T @ y_values
+    yy = y_values @ y_values
+
+    Z_test = y_test_values = None
+    if criterion == 'rmse_test':
+        Z_test = np.column_stack([np.ones(len(X_test)), X_test[all_vars].to_numpy(dtype=np.float64)])
+        y_test_values = np.asarray(y_test, dtype=np.float64)
+
+    max_vars = len(all_vars) if max_vars is None else max_vars
+    state = _StepwiseState(G, c, yy, n, range(1, len(all_vars) + 1) if direction == 'backward' else [])
+
+    def current_score():
+        rmse = None
+        if Z_test is not None:
+            rmse = np.sqrt(np.mean((y_test_values - Z_test[:, state.columns] @ state.beta()) ** 2))
+        return float(_score(state.ssr(), rmse, n, len(state.columns), criterion))
+
+    def entry(step, action):
+        var_list = [all_vars[j - 1] for j in state.columns[1:]]
+        return {'variables': ', '.join(var_list), 'var_list': var_list, 'score': current_score(),
+                'criterion': criterion, 'step': step, 'action': action}
+
+    path = [entry(0, 'start')]
+    while True:
+        moves = []
+        p = len(state.columns)
+        candidates = [j for j in range(1, len(all_vars) + 1) if j not in state.columns]
+        if direction in ('forward', 'both') and candidates and p - 1 < max_vars:
+            ssr, rmse = state.addition_candidates(candidates, Z_test, y_test_values)
+            scores = _score(ssr, rmse, n, p + 1, criterion)
+            if not np.all(np.isnan(scores)):
+                best = int(np.nanargmin(scores))
+                moves.append((scores[best], 'add', candidates[best]))
+        if direction in ('backward', 'both') and p > 1:
+            ssr, rmse = state.removal_candidates(Z_test, y_test_values)
+            scores = _score(ssr, rmse, n, p - 1, criterion)
+            best = int(np.argmin(scores))
+            moves.append((scores[best], 'remove', state.columns[best + 1]))
+
+        if not moves:
+            break
+        score, action, j = min(moves, key=lambda m: m[0])
+        if score >= path[-1]['score']:
+            break
+        if action == 'add':
+            state.add(j)
+        else:
+            state.remove(j)
+        path.append(entry(len(path), f"{action} {all_vars[j - 1]}"))
+
+    return sorted(path, key=lambda e: (e['score'], -e['step']))
@@ -0,0 +1,272 @@
+from dataclasses import dataclass, field
+from itertools import chain
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from Functions.data_preparation import sanitize_name
+
+__all__ = ['STREAM_CHUNK_ROWS', 'read_chunks', 'RunningMoments', 'iter_prepared_chunks', 'stream_prepare']
+
+STREAM_CHUNK_ROWS = 100_000
+
+
+def read_chunks(filepath, chunksize=STREAM_CHUNK_ROWS):
+    """
+    Yield (columns, float64 block) row chunks of a CSV or Parquet file
+    As in read_excel_data the first (date) column is dropped and names are sanitized.
+    Parquet input needs pyarrow
+    """
+    if Path(filepath).suffix.lower() == '.parquet':
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Reading Parquet files needs pyarrow") from e
+        frames = (batch.to_pandas() for batch in pq.ParquetFile(filepath).iter_batches(batch_size=chunksize))
+    else:
+        frames = pd.read_csv(filepath, chunksize=chunksize)
+
+    for frame in frames:
+        columns = [sanitize_name(c) for c in frame.columns[1:]]
+        yield columns, frame.iloc[:, 1:].to_numpy(dtype=np.float64)
+
+
+class _StreamingInterpolator:
+    """
+    Linear interpolation (limit_direction='both') over a row stream
+    Rows are held back until every missing value in them has a later valid value;
+    the last original valid value of each column is carried as the left anchor,
+    so results equal interpolate_block on the whole history. A long gap therefore
+    holds back every row after its start. With max_gap, of a gap open for more than
+    max_gap rows (e.g. a column that stops reporting) all but the last max_gap rows
+    are forward-filled instead, and interpolation continues from the filled value if
+    the column reports again: the buffer stays below max_gap rows plus one chunk, but
+    results are approximate. Columns that have not reported yet are always held back
+    for their back-fill
+    """
+
+    def __init__(self, n_columns, max_gap=None):
+        self.max_gap = max_gap
+        self.buffer = np.empty((0, n_columns))
+        self.anchor_pos = np.full(n_columns, -1)  # relative to the buffer start, -1 = none
+        self.anchor_val = np.full(n_columns, np.nan)
+        self.has_anchor = np.zeros(n_columns, dtype=bool)
+
+    def push(self, block):
+        self.buffer = np.vstack([self.buffer, block])
+        if len(self.buffer) == 0:
+            return self.buffer.copy()
+        n = len(self.buffer)
+        valid = ~np.isnan(self.buffer)
+        last_valid = np.where(valid.any(axis=0), n - 1 - np.argmax(valid[::-1], axis=0), -1)
+        column_ready = last_valid + 1
+        if self.max_gap is not None:
+            # Rows more than max_gap before the end of an open gap are released as forward fill
+            long_gap = (n - 1 - last_valid > self.max_gap) & ((last_valid >= 0) | self.has_anchor)
+            column_ready = np.where(long_gap, n - self.max_gap, column_ready)
+        return self._emit(int(column_ready.min()), final=False)
+
+    def flush(self):
+        return self._emit(len(self.buffer), final=True)
+
+    def _emit(self, ready, final):
+        buffer = self.buffer
+        n, k = buffer.shape
+        out = buffer[:ready].copy()
+        missing = np.isnan(buffer)
+        gaps = np.flatnonzero(missing[:ready].any(axis=0))
+        if len(gaps):
+            rows = np.arange(n, dtype=np.int32 if n < 2 ** 31 else np.int64)[:, None]
+            gap_missing = missing[:, gaps]
+            previous = np.where(gap_missing, -1, rows)
+            np.maximum.accumulate(previous, axis=0, out=previous)
+            following = np.where(gap_missing, n, rows)
+            np.minimum.accumulate(following[::-1], axis=0, out=following[::-1])
+
+            r, g = np.nonzero(gap_missing[:ready])
+            p, q = previous[r, g].astype(np.int64), following[r, g].astype(np.int64)
+            c = gaps[g]
+            anchored = (p < 0) & self.has_anchor[c]
+            p = np.where(anchored, self.anchor_pos[c], p)
+            has_p, has_q = (p >= 0) | anchored, q < n
+            p_val = np.where(anchored, self.anchor_val[c], buffer[np.clip(p, 0, n - 1), c])
+            q_val = buffer[np.clip(q, 0, n - 1), c]
+            left = np.where(has_p, p_val, q_val)
+            right = np.where(has_q, q_val, p_val)
+            weight = np.where(has_p & has_q, (r - p) / np.maximum(q - p, 1), 0.0)
+            out[r, c] = left + (right - left) * weight
+
+        # Carry the last original valid value of every column past the emitted rows
+        if ready:
+            emitted_valid = ~missing[:ready]
+            seen = emitted_valid.any(axis=0)
+            last = ready - 1 - np.argmax(emitted_valid[::-1], axis=0)
+            anchor_val = np.where(seen, buffer[last, np.arange(k)], self.anchor_val)
+            anchor_pos = np.where(seen, last, self.anchor_pos)
+            # Open gaps emitted as forward fill continue from the filled value
+            open_gap = missing[ready - 1] & ~(~missing[ready:]).any(axis=0) & ~np.isnan(out[ready - 1])
+            self.anchor_val = np.where(open_gap, out[ready - 1], anchor_val)
+            self.anchor_pos = np.where(open_gap, ready - 1, anchor_pos) - ready
+            self.has_anchor |= seen | open_gap
+        self.buffer = buffer[ready:]
+        if final:
+            self.buffer = np.empty((0, k))
+        return out
+
+
+class _StreamingDifferencer:
+    """Lag differences x[t] - x[t - order] per column, carrying the last max(orders) rows"""
+
+    def __init__(self, orders):
+        self.orders = np.asarray(orders)
+        self.lag = int(self.orders.max(initial=0))
+        self.tail = None
+
+    def push(self, block):
+        combined = block if self.tail is None else np.vstack([self.tail, block])
+        self.tail = combined[max(len(combined) - self.lag, 0):]
+        if len(combined) <= self.lag:
+            return np.empty((0, block.shape[1]))
+        out = combined[self.lag:].copy()
+        for order in np.unique(self.orders[self.orders > 0]):
+            columns = self.orders == order
+            out[:, columns] -= combined[self.lag - order:len(combined) - order, columns]
+        return out
+
+
+@dataclass
+class RunningMoments:
+    """
+    Count, means and co-moments of a row stream, merged chunk by chunk (Chan et al.),
+    plus the normal-equation cross products [1, X]'[1, X]
+    """
+    columns: list
+    n: int = 0
+    mean: np.ndarray = None
+    comoment: np.ndarray = None
+    gram: np.ndarray = field(default=None, repr=False)
+
+    def __post_init__(self):
+        k = len(self.columns)
+        self.mean = np.zeros(k) if self.mean is None else self.mean
+        self.comoment = np.zeros((k, k)) if self.comoment is None else self.comoment
+        self.gram = np.zeros((k + 1, k + 1)) if self.gram is None else self.gram
+
+    def update(self, block):
+        m = len(block)
+        if m == 0:
+            return self
+        chunk_mean = block.mean(axis=0)
+        centered = block - chunk_mean
+        delta = chunk_mean - self.mean
+        total = self.n + m
+        self.comoment = self.comoment + centered.T @ centered + np.outer(delta, delta) * self.n * m / total
+        self.mean = self.mean + delta * m / total
+        self.n = total
+
+        sums = block.sum(axis=0)
+        self.gram[0, 0] += m
+        self.gram[0, 1:] += sums
+        self.gram[1:, 0] += sums
+        self.gram[1:, 1:] += block.T @ block
+        return self
+
+    def covariance(self):
+        return pd.DataFrame(self.comoment / (self.n - 1), index=self.columns, columns=self.columns)
+
+    def correlation(self):
+        std = np.sqrt(np.diag(self.comoment))
+        return pd.DataFrame(self.comoment / np.outer(std, std), index=self.columns, columns=self.columns)
+
+    def ols(self, response, regressors):
+        """OLS coefficients (constant first) of response on regressors from the accumulated cross products"""
+        position = {name: i + 1 for i, name in enumerate(self.columns)}
+        idx = [0] + [position[name] for name in regressors]
+        coefficients = np.linalg.solve(self.gram[np.ix_(idx, idx)], self.gram[idx, position[response]])
+        return pd.Series(coefficients, index=['const'] + list(regressors))
+
+
+def _diff_info(columns, diff_orders):
+    """diff_info in the format of remove_nonstationarity; every column is differenced once by default"""
+    diff_orders = {} if diff_orders is None else dict(diff_orders)
+    info = {}
+    for col in columns:
+        order = int(diff_orders.get(col, 1))
+        name = col if order == 0 else (f"D{order}_{col}" if order > 1 else f"D_{col}")
+        info[col] = {'order': order, 'name': name}
+    return info
+
+
+def iter_prepared_chunks(filepath, diff_orders=None, chunksize=STREAM_CHUNK_ROWS, columns=None, max_gap=None):
+    """
+    Stream the preprocessing of a CSV/Parquet file chunk by chunk
+    Each chunk is interpolated, non-positive values are masked and interpolated
+    again, logs are taken and lag differences applied (orders per raw column in
+    diff_orders, 1 by default), carrying the boundary state between chunks.
+    Yields (levels, stationary) pairs of DataFrames: the interpolated raw rows and
+    the log-differenced rows that became final with this chunk. columns limits
+    the variables kept. Results equal the in-memory preprocessing; max_gap bounds
+    the rows held back by a long gap at the cost of forward-filling it (see
+    _StreamingInterpolator)
+    """
+    chunks = read_chunks(filepath, chunksize)
+    first_columns, first_block = next(chunks)
+    selected = list(first_columns) if columns is None else list(columns)
+    positions = [first_columns.index(col) for col in selected]
+    info = _diff_info(selected, diff_orders)
+
+    raw_interpolator = _StreamingInterpolator(len(selected), max_gap)
+    log_interpolator = _StreamingInterpolator(len(selected), max_gap)
+    differencer = _StreamingDifferencer([info[col]['order'] for col in selected])
+    stationary_names = [info[col]['name'] for col in selected]
+    offsets = {'levels': 0, 'stationary': 0}
+
+    def frames(levels, final=False):
+        logged = log_interpolator.push(_mask_nonpositive(levels))
+        if final:
+            logged = np.vstack([logged, log_interpolator.flush()])
+        logged = logged[~np.isnan(logged).any(axis=1)]  # as dropna() in log_transform
+        stationary = differencer.push(np.log(logged, out=logged))
+
+        levels_frame = pd.DataFrame(levels, columns=selected, copy=False,
+                                    index=pd.RangeIndex(offsets['levels'], offsets['levels'] + len(levels)))
+        stationary_frame = pd.DataFrame(stationary, columns=stationary_names, copy=False, index=pd.RangeIndex(
+            offsets['stationary'], offsets['stationary'] + len(stationary)))
+        offsets['levels'] += len(levels)
+        offsets['stationary'] += len(stationary)
+        return levels_frame, stationary_frame
+
+    for chunk_columns, block in chain([(first_columns, first_block)], chunks):
+        if chunk_columns != first_columns:
+            raise ValueError(f"Column mismatch between chunks of {filepath}")
+        yield frames(raw_interpolator.push(block[:, positions]))
+    yield frames(raw_interpolator.flush(), final=True)
+
+
+def _mask_nonpositive(block):
+    """Copy of block with values <= 0 set to NaN (they are interpolated over before taking logs)"""
+    return np.where(block > 0, block, np.nan)
+
+
+def stream_prepare(filepath, diff_orders=None, chunksize=STREAM_CHUNK_ROWS, columns=None, sink=None,
+                   max_gap=None):
+    """
+    Out-of-core preprocessing of a long CSV/Parquet history
+    Accumulates running moments (for correlations) and normal-equation cross
+    products of the interpolated levels and of the log-differenced data without
+    holding the history in memory. sink, if given, receives every
+    (levels, stationary) chunk, e.g. to write them out
+    """
+    levels_stats = stationary_stats = None
+    diff_info = None
+    for levels, stationary in iter_prepared_chunks(filepath, diff_orders, chunksize, columns, max_gap):
+        if levels_stats is None:
+            levels_stats = RunningMoments(list(levels.columns))
+            stationary_stats = RunningMoments(list(stationary.columns))
+            diff_info = _diff_info(list(levels.columns), diff_orders)
+        levels_stats.update(levels.to_numpy())
+        stationary_stats.update(stationary.to_numpy())
+        if sink is not None:
+            sink(levels, stationary)
+
+    return {'levels': levels_stats, 'stationary': stationary_stats, 'diff_info': diff_info,
+            'n_rows': levels_stats.n}
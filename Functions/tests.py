@@ -1,7 +1,14 @@
+from dataclasses import dataclass, field
+import numpy as np
 from statsmodels.stats.diagnostic import (het_breuschpagan, het_goldfeldquandt,acorr_ljungbox, acorr_breusch_godfrey)
 from statsmodels.stats.stattools import durbin_watson
 from statsmodels.stats.outliers_influence import variance_inflation_factor
-from scipy.stats import shapiro, jarque_bera
+from scipy.stats import shapiro, jarque_bera, chi2, f
+
+__all__ = ['test_normality_of_residuals', 'test_autocorrelation_comprehensive',
+           'test_heteroskedasticity_comprehensive', 'test_multicollinearity', 'DiagnosticsResult',
+           'run_diagnostics', 'print_diagnostics']
+
 
 def test_normality_of_residuals(residuals):
     """Test normality of residuals using Shapiro-Wilk and Jarque-Bera tests"""
@@ -112,3 +119,185 @@ def test_multicollinearity(X_with_const):
         print("Conclusion: Severe multicollinearity")
 
     return vif_values
+
+
+@dataclass
+class DiagnosticsResult:
+    """Residual diagnostics of a fitted OLS model"""
+    shapiro_stat: float
+    shapiro_pvalue: float
+    jb_stat: float
+    jb_pvalue: float
+    dw_stat: float
+    lb_stat: float
+    lb_pvalue: float
+    bg_stat: float
+    bg_pvalue: float
+    bp_stat: float
+    bp_pvalue: float
+    gq_stat: float
+    gq_pvalue: float
+    vif: dict = field(default_factory=dict)
+    lb_lags: int = 10
+    bg_lags: int = 2
+
+    @property
+    def max_vif(self):
+        return max(self.vif.values()) if self.vif else 1.0
+
+
+def _centered_r2(v, fitted):
+    """Centered R^2 of an auxiliary regression given its fitted values"""
+    ssr = np.sum((v - fitted) ** 2)
+    tss = np.sum((v - v.mean()) ** 2)
+    return 1.0 - ssr / tss
+
+
+def _ljung_box(residuals, lags):
+    """Ljung-Box Q statistic and p-value at a single lag"""
+    n = len(residuals)
+    e = residuals - residuals.mean()
+    denom = e @ e
+    k = np.arange(1, lags + 1)
+    acf = np.array([e[j:] @ e[:-j] for j in k]) / denom
+    q = n * (n + 2) * np.sum(acf ** 2 / (n - k))
+    return q, chi2.sf(q, lags)
+
+
+def _lagged_residuals(residuals, nlags):
+    """Residual lags 1..nlags with zeros before the start of the sample"""
+    n = len(residuals)
+    Z = np.zeros((n, nlags))
+    for j in range(1, nlags + 1):
+        Z[j:, j - 1] = residuals[:-j]
+    return Z
+
+
+def run_diagnostics(model, lb_lags=10, bg_lags=2):
+    """
+    Compute normality, autocorrelation, heteroskedasticity and VIF diagnostics in one pass
+    Auxiliary regressions reuse a single QR of X and the model residuals;
+    VIF comes from the diagonal of the inverse correlation matrix of the regressors.
+    Statistics match the statsmodels/scipy tests used by the test_* functions
+    """
+    X = np.asarray(model.model.exog, dtype=np.float64)
+    names = list(model.model.exog_names)
+    e = np.asarray(model.resid, dtype=np.float64)
+    n, k = X.shape
+    Q, _ = np.linalg.qr(X)
+
+    W, p_shapiro = shapiro(e)
+    jb_stat, jb_p = jarque_bera(e)
+    dw_stat = np.sum(np.diff(e) ** 2) / (e @ e)
+    lb_stat, lb_p = _ljung_box(e, lb_lags)
+
+    # Breusch-Godfrey: e is orthogonal to X, so only the lags residualized on X matter
+    Z = _lagged_residuals(e, bg_lags)
+    Z_resid = Z - Q @ (Q.T @ Z)
+    coef = np.linalg.lstsq(Z_resid, e, rcond=None)[0]
+    bg_stat = n * _centered_r2(e, Z_resid @ coef)
+    bg_p = chi2.sf(bg_stat, bg_lags)
+
+    # Breusch-Pagan (Koenker form): squared residuals on X
+    e2 = e ** 2
+    bp_stat = n * _centered_r2(e2, Q @ (Q.T @ e2))
+    bp_p = chi2.sf(bp_stat, k - 1)
+
+    # Goldfeld-Quandt: residuals on X in the two halves of the sample
+    split = n // 2
+    halves = []
+    for rows in (slice(None, split), slice(split, None)):
+        beta, _, rank, _ = np.linalg.lstsq(X[rows], e[rows], rcond=None)
+        resid = e[rows] - X[rows] @ beta
+        df_resid = len(e[rows]) - rank  # as OLS.df_resid, so rank-deficient halves match statsmodels
+        halves.append((resid @ resid / df_resid if df_resid > 0 else np.nan, df_resid))
+    if halves[0][1] > 0 and halves[1][1] > 0:
+        gq_stat = halves[1][0] / halves[0][0]
+        gq_p = f.sf(gq_stat, halves[0][1], halves[1][1])
+    else:
+        gq_stat = gq_p = np.nan
+
+    regressors = [i for i, name in enumerate(names) if name != 'const']
+    vif = {}
+    if len(regressors) == 1:
+        vif[names[regressors[0]]] = 1.0
+    elif regressors:
+        corr = np.corrcoef(X[:, regressors], rowvar=False)
+        vif = dict(zip([names[i] for i in regressors], np.diag(np.linalg.inv(corr))))
+
+    return DiagnosticsResult(
+        shapiro_stat=float(W), shapiro_pvalue=float(p_shapiro),
+        jb_stat=float(jb_stat), jb_pvalue=float(jb_p),
+        dw_stat=float(dw_stat),
+        lb_stat=float(lb_stat), lb_pvalue=float(lb_p),
+        bg_stat=float(bg_stat), bg_pvalue=float(bg_p),
+        bp_stat=float(bp_stat), bp_pvalue=float(bp_p),
+        gq_stat=float(gq_stat), gq_pvalue=float(gq_p),
+        vif={name: float(v) for name, v in vif.items()},
+        lb_lags=lb_lags, bg_lags=bg_lags,
+    )
+
+
+def _print_conclusion(reject, reject_msg, accept_msg):
+    print(f" Conclusion: {reject_msg}" if reject else f" Conclusion: {accept_msg}")
+
+
+def print_diagnostics(result):
+    """Print a DiagnosticsResult in the format of the test_* functions"""
+    print("\n--- Normality test ---")
+    print(f"Shapiro-Wilk Test:")
+    print(f" Statistic W = {result.shapiro_stat:.4f}")
+    print(f" p-value = {result.shapiro_pvalue:.4f}")
+    _print_conclusion(result.shapiro_pvalue < 0.05, "Reject H0 - residuals are not normal",
+                      "Cannot reject H0 - residuals are normal")
+    print(f"\nJarque-Bera Test:")
+    print(f" Statistic JB = {result.jb_stat:.4f}")
+    print(f" p-value = {result.jb_pvalue:.4f}")
+    _print_conclusion(result.jb_pvalue < 0.05, "Reject H0 - residuals are not normal",
+                      "Cannot reject H0 - residuals are normal")
+
+    print("\n--- Autocorrelation tests ---")
+    print("Autocorrelation tests:")
+    print(f"\nDurbin-Watson Test:")
+    print(f" Statistic DW = {result.dw_stat:.4f}")
+    _print_conclusion(not 1.5 <= result.dw_stat <= 2.5, "Suspected autocorrelation",
+                      "Cannot reject H0 - no autocorrelation")
+    print(f"\nLjung-Box Test:")
+    print(f" Statistic LB = {result.lb_stat:.4f}")
+    print(f" p-value = {result.lb_pvalue:.4f}")
+    _print_conclusion(result.lb_pvalue <= 0.05, "Reject H0 - autocorrelation present",
+                      "Cannot reject H0 - no autocorrelation")
+    print(f"\nBreusch-Godfrey Test:")
+    print(f" Statistic LM = {result.bg_stat:.4f}")
+    print(f" p-value = {result.bg_pvalue:.4f}")
+    _print_conclusion(result.bg_pvalue <= 0.05, "Reject H0 - autocorrelation present",
+                      "Cannot reject H0 - no autocorrelation")
+
+    print("\n--- Heteroskedasticity tests ---")
+    print("Heteroskedasticity tests:")
+    print(f"\nBreusch-Pagan Test:")
+    print(f" Statistic BP = {result.bp_stat:.4f}")
+    print(f" p-value = {result.bp_pvalue:.4f}")
+    _print_conclusion(result.bp_pvalue <= 0.05, "Reject H0 - heteroskedasticity",
+                      "Cannot reject H0 - homoskedasticity")
+    print(f"\nGoldfeld-Quandt Test:")
+    print(f" Statistic GQ = {result.gq_stat:.4f}")
+    print(f" p-value = {result.gq_pvalue:.4f}")
+    _print_conclusion(result.gq_pvalue <= 0.05, "Reject H0 - heteroskedasticity",
+                      "Cannot reject H0 - homoskedasticity")
+
+    print("\n--- Multicollinearity test ---")
+    print("Multicollinearity test (VIF):")
+    if len(result.vif) <= 1:
+        print("Only one explanatory variable - no multicollinearity issues")
+        return
+    for name, vif in result.vif.items():
+        print(f" VIF for {name}: {vif:.4f}")
+    max_vif = result.max_vif
+    print(f"Maximum VIF: {max_vif:.4f}")
+    if max_vif < 5:
+        print("Conclusion: No multicollinearity issues")
+    elif max_vif < 10:
+        print("Conclusion: Moderate multicollinearity")
+    else:
+        print("Conclusion: Severe multicollinearity")
@@ -0,0 +1,360 @@
+"""
+Synthetic-data benchmarks for every pipeline stage
+
+Usage (from the repository root, fully offline):
+    python -m benchmarks.run_benchmarks --rows 300 3000 --vars 8 12 --output bench_results.json
+    python -m benchmarks.run_benchmarks --compare old.json new.json
+    python -m benchmarks.run_benchmarks --startup
+    python -m benchmarks.run_benchmarks --check-streaming
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from datetime import datetime, timezone
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import statsmodels.api as sm
+from Functions import correlation, stationarity_check
+from Functions.data_preparation import (load_and_prepare_data, filter_by_correlation_with_y, log_transform,
+                                        log_transform_block, difference_block, interpolate_block,
+                                        log_transform_compact, difference_compact)
+from Functions.stationarity_check import analyze_stationarity, remove_nonstationarity, apply_diff_to_test_data
+from Functions.hellwig import hellwig_method_original, hellwig_method_bitmask
+from Functions.stepwise import stepwise_selection
+from Functions.lags import lagged_frame
+from Functions.streaming import stream_prepare, iter_prepared_chunks
+from Functions.model_building import build_ols_model
+from Functions.model_artifact import build_model_artifact, predict_levels
+from Functions.scenarios import simulate_scenarios
+from Functions.metrics import evaluate_forecasts
+from Functions.tests import (test_normality_of_residuals, test_autocorrelation_comprehensive,
+                             test_heteroskedasticity_comprehensive, test_multicollinearity, run_diagnostics)
+
+# Exhaustive enumeration in hellwig_method_original is skipped above this many candidates
+ORIGINAL_HELLWIG_LIMIT = 12
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+# Start-up budgets in seconds (best of several runs) for the lightweight entry points
+STARTUP_BUDGETS = {
+    'cli --help': (['econometric_project.py', '--help'], 0.5),
+    'cli predict --help': (['econometric_project.py', 'predict', '--help'], 0.5),
+    'import predict path': (['-c', 'import Functions.model_artifact'], 1.0),
+    'import pipeline': (['-c', 'import Functions.pipeline'], 1.0),
+}
+# Modules that must not be imported before a stage needs them
+HEAVY_MODULES = ('statsmodels', 'scipy', 'matplotlib', 'seaborn')
+
+
+def make_synthetic_panel(n_rows, n_vars, missing_rate=0.02, seed=0):
+    """
+    Monthly-style panel with a known structure
+    CLOSE and half of the drivers are I(1) (exponentiated random walks sharing a
+    common factor), the other drivers are I(0) AR(1) series around a positive level.
+    A leading Date column and randomly missing values mimic data.xlsx
+    """
+    rng = np.random.default_rng(seed)
+    factor = rng.normal(size=n_rows)
+    close = np.exp(1.5 + np.cumsum(0.03 * factor + 0.02 * rng.normal(size=n_rows)))
+
+    columns = {'Date': np.arange(n_rows), 'CLOSE': close}
+    for j in range(n_vars):
+        loading = rng.uniform(-1, 1)
+        if j % 2 == 0:
+            steps = 0.02 * (loading * factor + rng.normal(size=n_rows))
+            columns[f'X{j}'] = np.exp(2.0 + np.cumsum(steps))
+        else:
+            series = np.empty(n_rows)
+            series[0] = 0.0
+            shocks = loading * factor + rng.normal(size=n_rows)
+            for t in range(1, n_rows):
+                series[t] = 0.5 * series[t - 1] + shocks[t]
+            columns[f'X{j}'] = 10.0 + series
+
+    data = pd.DataFrame(columns)
+    missing = rng.random((n_rows, n_vars + 1)) < missing_rate
+    missing[0] = False  # keep the first row complete
+    data.iloc[:, 1:] = data.iloc[:, 1:].mask(missing)
+    return data
+
+
+def _reset_caches():
+    """Drop in-process memoization so every measurement starts cold"""
+    stationarity_check._TEST_CACHE.clear()
+    correlation.clear_correlation_cache()
+
+
+def _measure(func, *args, memory=True, **kwargs):
+    """Wall time, CPU time and (optionally) tracemalloc peak of one call with output suppressed"""
+    _reset_caches()
+    with contextlib.redirect_stdout(io.StringIO()):
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        result = func(*args, **kwargs)
+        wall = time.perf_counter() - wall
+        cpu = time.process_time() - cpu
+
+    peak_mb = None
+    if memory:
+        _reset_caches()
+        tracemalloc.start()
+        with contextlib.redirect_stdout(io.StringIO()):
+            func(*args, **kwargs)
+        peak_mb = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+    return result, {'wall_s': wall, 'cpu_s': cpu, 'peak_mb': peak_mb}
+
+
+def prepare_frames(filepath, diff_info):
+    """Current preprocessing path: split frames, log_transform and lag differences"""
+    data_learning, data_test, _ = load_and_prepare_data(filepath)
+    data_log = log_transform(data_learning)
+    data_test_log = log_transform(data_test)
+    return apply_diff_to_test_data(data_log, diff_info), apply_diff_to_test_data(data_test_log, diff_info)
+
+
+def prepare_block(filepath, diff_info, dtype):
+    """Same preprocessing as the pipeline with compact_dtype: one block, in-place log and differencing"""
+    data_learning, data_test, _ = load_and_prepare_data(filepath, dtype=dtype)
+    return [difference_compact(log_transform_compact(part), diff_info) for part in (data_learning, data_test)]
+
+
+def run_scenario(n_rows, n_vars, missing_rate, seed=0, memory=True):
+    """Time every public stage on one synthetic panel; returns a list of records"""
+    panel = make_synthetic_panel(n_rows, n_vars, missing_rate, seed)
+    panel.to_excel("synthetic.xlsx", index=False)
+    records = []
+
+    def record(stage, func, *args, **kwargs):
+        result, stats = _measure(func, *args, memory=memory, **kwargs)
+        records.append({'rows': n_rows, 'vars': n_vars, 'missing_rate': missing_rate, 'stage': stage, **stats})
+        return result
+
+    record('load_and_prepare_data[cold]', load_and_prepare_data, "synthetic.xlsx", use_cache=False)
+    load_and_prepare_data("synthetic.xlsx")  # populate the data cache
+    data_learning, data_test, _ = record('load_and_prepare_data[warm]', load_and_prepare_data, "synthetic.xlsx")
+
+    data_filtered, _ = record('filter_by_correlation_with_y', filter_by_correlation_with_y,
+                              data_learning, "CLOSE", 0.0, 1.0)
+    data_log = record('log_transform', log_transform, data_filtered)
+    non_stationary_vars, _ = record('analyze_stationarity', analyze_stationarity, data_log, n_jobs=1)
+    data_stationary, diff_info = record('remove_nonstationarity', remove_nonstationarity,
+                                data_log, non_stationary_vars, n_jobs=1)
+
+    # Whole-panel preprocessing with the orders found above, frame path vs single block
+    full_diff_info = {col: {'order': 0, 'name': col} for col in data_learning.columns}
+    full_diff_info.update(diff_info)
+    record('prepare[frames]', prepare_frames, "synthetic.xlsx", full_diff_info)
+    record('prepare[block float64]', prepare_block, "synthetic.xlsx", full_diff_info, np.float64)
+    record('prepare[block float32]', prepare_block, "synthetic.xlsx", full_diff_info, np.float32)
+    panel.to_csv("synthetic.csv", index=False)
+    record('prepare[streamed csv]', stream_prepare, "synthetic.csv",
+           {col: info['order'] for col, info in full_diff_info.items()}, chunksize=max(n_rows // 10, 1))
+
+    response = 'D_CLOSE' if 'D_CLOSE' in data_stationary.columns else 'CLOSE'
+    Y = data_stationary[response]
+    X = data_stationary.drop(columns=[response])
+    record('lagged_frame[L=12]', lagged_frame, data_stationary, 12, list(X.columns))
+    if X.shape[1] <= ORIGINAL_HELLWIG_LIMIT:
+        record('hellwig_method_original', hellwig_method_original, Y, X)
+    hellwig_results = record('hellwig_method_bitmask', hellwig_method_bitmask, Y, X)
+    record('stepwise_selection[both, aic]', stepwise_selection, Y, X, 'both', 'aic')
+    noise = np.random.default_rng(seed).normal(scale=Y.std(), size=(1000, len(Y)))
+    record('evaluate_forecasts[1000 models]', evaluate_forecasts, Y.to_numpy(), Y.to_numpy() + noise)
+
+    best_vars = hellwig_results[0]['var_list']
+    model, X_with_const = record('build_ols_model', build_ols_model, data_stationary, response, best_vars)
+    if response != 'CLOSE':
+        artifact = build_model_artifact(model.params, diff_info, data_learning, response)
+        record('predict_levels[1 row]', predict_levels, artifact, data_test.iloc[:1])
+        record('predict_levels[test set]', predict_levels, artifact, data_test)
+        last = data_test[artifact.raw_columns[1:]].to_numpy()[-1]
+        shocks = np.random.default_rng(seed).normal(scale=0.02, size=(10000, 12, len(last)))
+        record('simulate_scenarios[10000 x 12]', simulate_scenarios, artifact, last * np.exp(shocks.cumsum(axis=1)))
+    residuals = model.resid
+    record('test_normality_of_residuals', test_normality_of_residuals, residuals)
+    record('test_autocorrelation_comprehensive', test_autocorrelation_comprehensive, residuals, model)
+    record('test_heteroskedasticity_comprehensive', test_heteroskedasticity_comprehensive,
+           residuals, X_with_const, model.fittedvalues)
+    record('test_multicollinearity', test_multicollinearity, sm.add_constant(X))
+    record('run_diagnostics', run_diagnostics, model)
+    return records
+
+
+def _print_preparation_memory(records):
+    """Peak-memory reduction of the block preprocessing paths relative to the frame path"""
+    peaks = {rec['stage']: rec['peak_mb'] for rec in records if rec['stage'].startswith('prepare[')}
+    baseline = peaks['prepare[frames]']
+    for stage in ('prepare[block float64]', 'prepare[block float32]'):
+        print(f"  {stage} peak memory: {peaks[stage]:.2f} MB vs {baseline:.2f} MB "
+              f"({1 - peaks[stage] / baseline:.0%} lower)")
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(rows, n_vars, missing_rates, seed=0, memory=True):
+    """Run every scenario in a scratch directory so on-disk caches start empty"""
+    meta = {
+        'commit': _git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+    }
+    results = []
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as scratch:
+        os.chdir(scratch)
+        try:
+            for n in rows:
+                for k in n_vars:
+                    for rate in missing_rates:
+                        print(f"Scenario: rows={n}, vars={k}, missing={rate}")
+                        records = run_scenario(n, k, rate, seed, memory)
+                        for rec in records:
+                            results.append(rec)
+                            peak = f"{rec['peak_mb']:.1f} MB" if rec['peak_mb'] is not None else "-"
+                            print(f"  {rec['stage']:<40} {rec['wall_s']:9.4f} s  {peak}")
+                        if memory:
+                            _print_preparation_memory(records)
+        finally:
+            os.chdir(cwd)
+    return {'meta': meta, 'results': results}
+
+
+def measure_startup(repeats=5):
+    """
+    Time the lightweight entry points in fresh interpreters against STARTUP_BUDGETS
+    and check that importing the pipeline leaves the heavy libraries unloaded
+    """
+    results = []
+    for name, (args, budget) in STARTUP_BUDGETS.items():
+        timings = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            subprocess.run([sys.executable, *args], cwd=REPO_ROOT, capture_output=True, check=True)
+            timings.append(time.perf_counter() - started)
+        best = min(timings)
+        results.append({'entry_point': name, 'best_s': best, 'budget_s': budget, 'ok': best <= budget})
+        print(f"  {name:<25} {best:7.3f} s  (budget {budget:.1f} s)  {'ok' if best <= budget else 'OVER BUDGET'}")
+
+    probe = ("import sys, Functions.pipeline, Functions.model_artifact; "
+             f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+    loaded = subprocess.run([sys.executable, '-c', probe], cwd=REPO_ROOT, capture_output=True, text=True,
+                            check=True).stdout.strip()
+    loaded = loaded.split(',') if loaded else []
+    print(f"  heavy modules loaded by the pipeline and predict imports: {loaded or 'none'}")
+    return {'entry_points': results, 'eager_heavy_modules': loaded,
+            'ok': all(r['ok'] for r in results) and not loaded}
+
+
+def check_streaming(n_rows=60_000, n_vars=4, chunksize=7_000, max_gap=5_000, seed=0):
+    """
+    Compare streamed preprocessing with interpolate_block, log and differencing on the
+    whole history, for a panel where X0 starts reporting after 2/3 of the rows and X1
+    has an interior gap longer than max_gap. The default stream must match exactly;
+    with max_gap only the long interior gap may differ
+    """
+    panel = make_synthetic_panel(n_rows, n_vars, seed=seed)
+    panel.loc[:2 * n_rows // 3, 'X0'] = np.nan
+    gap = slice(n_rows // 4, n_rows // 4 + 2 * max_gap)
+    panel.loc[gap, 'X1'] = np.nan
+    orders = [1] * (n_vars + 1)
+    expected_levels = interpolate_block(panel.iloc[:, 1:].to_numpy(dtype=np.float64, copy=True))
+    with contextlib.redirect_stdout(io.StringIO()):
+        expected_stationary = difference_block(log_transform_block(expected_levels.copy())[0], orders)
+
+    results = []
+    with tempfile.TemporaryDirectory() as scratch:
+        path = Path(scratch) / "streaming.csv"
+        panel.to_csv(path, index=False)
+        for label, gap_limit in (('exact', None), (f'max_gap={max_gap}', max_gap)):
+            chunks = list(iter_prepared_chunks(path, chunksize=chunksize, max_gap=gap_limit))
+            levels = np.vstack([chunk[0].to_numpy() for chunk in chunks])
+            stationary = np.vstack([chunk[1].to_numpy() for chunk in chunks])
+            compared = np.ones(n_vars + 1, dtype=bool)
+            if gap_limit is not None:
+                compared[2] = False  # X1 is forward-filled across its long gap
+            ok = (levels.shape == expected_levels.shape and stationary.shape == expected_stationary.shape
+                  and np.allclose(levels[:, compared], expected_levels[:, compared])
+                  and np.allclose(stationary[:, compared], expected_stationary[:, compared]))
+            results.append({'mode': label, 'levels_rows': len(levels), 'stationary_rows': len(stationary),
+                            'ok': bool(ok)})
+            print(f"  {label:<15} {len(levels)} level rows, {len(stationary)} stationary rows "
+                  f"(expected {len(expected_levels)}, {len(expected_stationary)})  {'ok' if ok else 'MISMATCH'}")
+    return {'checks': results, 'ok': all(r['ok'] for r in results)}
+
+
+def compare_reports(old_path, new_path):
+    """Print wall-time ratios new/old for matching (rows, vars, missing_rate, stage) records"""
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+
+    key = lambda r: (r['rows'], r['vars'], r['missing_rate'], r['stage'])
+    baseline = {key(r): r for r in old['results']}
+    print(f"Comparing {new['meta'].get('commit')} against {old['meta'].get('commit')}")
+    for rec in new['results']:
+        ref = baseline.get(key(rec))
+        if ref is None:
+            continue
+        ratio = rec['wall_s'] / ref['wall_s'] if ref['wall_s'] > 0 else float('nan')
+        print(f"rows={rec['rows']:<6} vars={rec['vars']:<4} {rec['stage']:<40} "
+              f"{ref['wall_s']:9.4f} s -> {rec['wall_s']:9.4f} s  (x{ratio:.2f})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark pipeline stages on synthetic data")
+    parser.add_argument('--rows', type=int, nargs='+', default=[300, 3000])
+    parser.add_argument('--vars', type=int, nargs='+', default=[8, 12])
+    parser.add_argument('--missing', type=float, nargs='+', default=[0.02])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory', action='store_true', help="Skip the tracemalloc pass")
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help="Compare two result files")
+    parser.add_argument('--startup', action='store_true',
+                        help="Check CLI start-up times against their budgets (exit status 1 when over)")
+    parser.add_argument('--check-streaming', action='store_true',
+                        help="Check streamed preprocessing against the in-memory path (exit status 1 on mismatch)")
+    args = parser.parse_args(argv)
+    warnings.filterwarnings("ignore")
+
+    if args.compare:
+        compare_reports(*args.compare)
+        return
+    if args.startup:
+        print("Start-up times:")
+        if not measure_startup()['ok']:
+            sys.exit(1)
+        return
+    if args.check_streaming:
+        print("Streamed preprocessing:")
+        if not check_streaming()['ok']:
+            sys.exit(1)
+        return
+
+    report = run_benchmarks(args.rows, args.vars, args.missing, args.seed, memory=not args.no_memory)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,170 +1,242 @@
 # econometric_project.py
 
+import argparse
+import sys
 import warnings
 
 warnings.filterwarnings("ignore")
-from Functions.data_preparation import *
-from Functions.stationarity_check import *
-from Functions.tests import *
-from Functions.model_building import *
-from Functions.hellwig import *
-from Functions.plots_creation import *
-import statsmodels.api as sm
-
-
-
-def main():
-    print("=== ECONOMETRIC PROJECT ===\n")
-
-    # 1) Data loading
-    print("1. Loading data...")
-    data_learning, data_test, alpha = load_and_prepare_data("data.xlsx")
-    print(f"Data loaded: {data_learning.shape[0]} training obs., {data_test.shape[0]} test obs.")
-    print(f"Variables: {list(data_learning.columns)}")
-
-    # 2) Correlation filtering
-    print("\n2. Filtering variables by correlation with target...")
-    data_filtered, removed_vars = filter_by_correlation_with_y(data_learning)
-    data_test = data_test.drop(columns=[v for v in removed_vars if v in data_test.columns], errors='ignore')
-
-    # 3) Remove INFLATION
-    print("\n3. Removing INFLATION variable...")
-    data_filtered, data_test = remove_inflation_variable(data_filtered, data_test)
-
-    # 4) Log transformation
-    print("\n4. Log transformation...")
-    data_log = log_transform(data_filtered)
-    data_test_log = log_transform(data_test[data_log.columns])
-
-    print("\nCreating correlation heatmap...")
-    plot_correlation_heatmap(data_filtered)
-    # 5) Stationarity analysis
-    print("\n5. Stationarity analysis...")
-    non_stationary_vars, stationary_vars = analyze_stationarity(data_log)
 
-    # 6) Remove non-stationarity
-    print("\n6. Removing non-stationarity through differencing...")
-    data_stationary, diff_info = remove_nonstationarity(data_log, non_stationary_vars, max_diff=2)
-    data_test_stationary = apply_diff_to_test_data(data_test_log, diff_info)
-
-    # 7) Re-check stationarity
-    print("\n7. Re-checking stationarity...")
-    _, _ = analyze_stationarity(data_stationary)
-
-    # 8) Remove low variance variables
-    print("\n8. Removing low variance variables...")
-    data_stationary, data_test_stationary = remove_low_variance_variables(data_stationary, data_test_stationary)
-
-    # 9) Hellwig method
-    print("\n9. Hellwig method - variable selection...")
-    if 'D_CLOSE' not in data_stationary.columns:
-        raise ValueError("D_CLOSE not found after transformations!")
-
-    Y = data_stationary['D_CLOSE']
-    X = data_stationary.drop(columns=['D_CLOSE'])
-
-    hellwig_results = hellwig_method_original(Y, X)
-
-    print("Best variable combinations (Hellwig method):")
-    for i, result in enumerate(hellwig_results[:5], 1):
-        print(f"{i}. {result['variables']} -> Capacity: {result['capacity']:.4f}")
-
-    best_combination = hellwig_results[0]
-    best_vars = best_combination['var_list']
-    print(f"\nSelected variables for model: {best_vars}")
-    print(f"Hellwig capacity: {best_combination['capacity']:.4f}")
-
-    # 10) Prepare final data
-    final_columns = ['D_CLOSE'] + best_vars
-    data_final = data_stationary[final_columns].copy()
-    data_test_final = data_test_stationary[final_columns].copy()
-
-    # 11) Build model
-    print("\n10. Building econometric model...")
-    model, X_with_const = build_ols_model(data_final, 'D_CLOSE', best_vars)
-
-    # 12) Model diagnostics
-    residuals = model.resid
-    fitted_values = model.fittedvalues
-
-    print("\n11. Model diagnostics:")
-
-    print("\n--- Normality test ---")
-    test_normality_of_residuals(residuals)
-
-    print("\n--- Autocorrelation tests ---")
-    test_autocorrelation_comprehensive(residuals, model)
-
-    print("\n--- Heteroskedasticity tests ---")
-    test_heteroskedasticity_comprehensive(residuals, X_with_const, fitted_values)
-
-    print("\n--- Multicollinearity test ---")
-    test_multicollinearity(X_with_const)
-
-    # 13) Parameter interpretation
-    print("\n12. Parameter interpretation:")
-    for param_name, coef in model.params.items():
-        p_value = model.pvalues[param_name]
-        t_value = model.tvalues[param_name]
-
-        significance = ""
-        if p_value < 0.001:
-            significance = "***"
-        elif p_value < 0.01:
-            significance = "**"
-        elif p_value < 0.05:
-            significance = "*"
-        elif p_value < 0.1:
-            significance = "."
-
-        print(f"\n{param_name}:")
-        print(f"  Coefficient: {coef:.6f}")
-        print(f"  t-statistic: {t_value:.4f}")
-        print(f"  p-value: {p_value:.4f} {significance}")
-
-        if p_value < 0.05:
-            print(f"  Status: STATISTICALLY SIGNIFICANT")
-        else:
-            print(f"  Status: NOT STATISTICALLY SIGNIFICANT")
-
-    # 14) Out-of-sample evaluation
-    print("\n13. Out-of-sample model evaluation...")
-
-    test_predictors = X_with_const.columns
-    missing_in_test = [col for col in test_predictors if col not in data_test_final.columns and col != 'const']
-
-    if missing_in_test:
-        print(f"Warning: Missing variables in test data: {missing_in_test}")
-
-    X_test = data_test_final[best_vars]
-    X_test_with_const = sm.add_constant(X_test)
-    Y_test = data_test_final['D_CLOSE']
-
-    predictions = model.predict(X_test_with_const)
-
-    mae = np.mean(np.abs(Y_test - predictions))
-    rmse = np.sqrt(np.mean((Y_test - predictions) ** 2))
+# Heavy modules (pandas, statsmodels, matplotlib) are imported by the command
+# handlers, so argument parsing and --help stay fast
+COMMANDS = ('run', 'predict', 'simulate', 'diagnose', 'report', 'plot')
+# Literal copy of Functions.pipeline.STAGE_NAMES, so --help does not import the pipeline
+STAGE_NAMES = ('load', 'correlation_filter', 'log_transform', 'heatmap', 'stationarity', 'differencing', 'lags',
+               'selection', 'fit', 'state', 'diagnostics', 'evaluation', 'export', 'plots')
+
+
+def _pipeline_options():
+    """Options of the subcommands that run pipeline stages; unset ones fall back to DEFAULT_CONFIG"""
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--data', help="Path to the Excel input (default data.xlsx)")
+    parser.add_argument('--from-stage', metavar='STAGE', choices=STAGE_NAMES, help="Recompute this stage and everything after it")
+    parser.add_argument('--force', nargs='+', default=[], metavar='STAGE', choices=STAGE_NAMES + ('all',),
+                        help="Recompute the given stages regardless of the cache ('all' for every stage)")
+    parser.add_argument('--hellwig-top-k', type=int, help="Number of Hellwig combinations to keep")
+    parser.add_argument('--compare-top-n', type=int, help="Number of top combinations compared by fit")
+    parser.add_argument('--max-lag', type=int, help="Add distributed lags 0..MAX_LAG of the regressors (default 0)")
+    parser.add_argument('--lag-vars', nargs='+', metavar='VAR',
+                        help="Differenced regressors to lag, e.g. D_WIBOR (default all)")
+    parser.add_argument('--selection', choices=['hellwig', 'stepwise'], help="Variable selection method")
+    parser.add_argument('--stepwise-direction', choices=['forward', 'backward', 'both'],
+                        help="Direction of stepwise selection (default both)")
+    parser.add_argument('--stepwise-criterion', choices=['aic', 'bic', 'rmse_test'],
+                        help="Criterion of stepwise selection (default aic)")
+    parser.add_argument('--bootstrap-reps', type=int,
+                        help="Block-bootstrap replicates for confidence intervals (0 disables)")
+    parser.add_argument('--compact-dtype', choices=['float32', 'float64'],
+                        help="Preprocess on a single NumPy block of this dtype with in-place transforms")
+    parser.add_argument('--no-data-cache', action='store_true',
+                        help="Parse the input file instead of reading (and writing) the preprocessed data cache")
+    parser.add_argument('--report', help="Write a JSON run report with per-stage timings and outputs")
+    parser.add_argument('--trace-memory', action='store_true', help="Record per-stage tracemalloc peaks")
+    return parser
+
+
+def _plot_options():
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--plot-dpi', type=int, help="Resolution of saved plots")
+    parser.add_argument('--plot-format', help="File format of saved plots")
+    return parser
+
+
+def parse_args(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0] not in COMMANDS + ('-h', '--help'):
+        argv = ['run'] + argv  # bare options keep running the full pipeline
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--log-level', default='INFO', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                        help="Console verbosity")
+    pipeline_options = _pipeline_options()
+    plot_options = _plot_options()
+
+    parser = argparse.ArgumentParser(description="Econometric modeling of Polish 10Y bond yields")
+    commands = parser.add_subparsers(dest='command', metavar='COMMAND')
+
+    run = commands.add_parser('run', parents=[common, pipeline_options, plot_options],
+                              help="Run the full pipeline (default)")
+    run.add_argument('--no-plots', action='store_true', help="Skip plot creation")
+    run.add_argument('--headless', action='store_true',
+                     help="Render plots in a background process without opening windows")
+    run.add_argument('--batch', metavar='JOBS_JSON',
+                     help="Run a JSON list of {dataset, target, config} jobs in parallel instead")
+    run.add_argument('--batch-workers', type=int, help="Maximum number of concurrent batch jobs")
+    run.add_argument('--batch-output', default='batch_results.csv', help="CSV file for the batch comparison table")
+    run.add_argument('--incremental', action='store_true',
+                     help="Fold rows appended to the data file into the stored pipeline state")
+
+    predict = commands.add_parser('predict', parents=[common],
+                                  help="Forecast yield levels from raw observations with the saved model artifact")
+    predict.add_argument('input', help="CSV or Excel file with raw (undifferenced) observations")
+    predict.add_argument('--model', help="Model artifact file (default model/model_artifact.json)")
+    predict.add_argument('--output', help="Write forecasts to this CSV instead of printing them")
+
+    simulate = commands.add_parser('simulate', parents=[common],
+                                   help="Push raw-level regressor scenarios through the saved model artifact")
+    simulate.add_argument('scenarios', help=".npy array (scenarios, horizon, regressors) in the artifact's regressor "
+                                            "order, or .npz with one (scenarios, horizon) array per raw regressor")
+    simulate.add_argument('--model', help="Model artifact file (default model/model_artifact.json)")
+    simulate.add_argument('--noise-draws', type=int, default=0,
+                          help="Noisy paths per scenario with bootstrapped residuals (default 0, no noise)")
+    simulate.add_argument('--seed', type=int, help="Seed of the residual bootstrap")
+    simulate.add_argument('--chunk-size', type=int, help="Scenarios transformed per chunk")
+    simulate.add_argument('--output', help="Write the simulated paths to this .npz file")
+
+    commands.add_parser('diagnose', parents=[common, pipeline_options],
+                        help="Run the pipeline up to the model diagnostics")
+    report = commands.add_parser('report', parents=[common, pipeline_options],
+                                 help="Diagnose the top candidate models in parallel and write a ranked report")
+    report.add_argument('--top-n', type=int, default=10, help="Number of candidate models to diagnose")
+    report.add_argument('--rank-by', default='aic', choices=['aic', 'bic', 'rmse_test', 'r2', 'adj_r2'],
+                        help="Fit score breaking ties in the number of passed checks")
+    report.add_argument('--workers', type=int, help="Worker processes (default one per core)")
+    report.add_argument('--output', default='candidate_report.md',
+                        help="Markdown report path; a CSV with the same stem is written next to it")
+    commands.add_parser('plot', parents=[common, pipeline_options, plot_options],
+                        help="Run the pipeline and render all plots headlessly")
+    return parser.parse_args(argv)
+
+
+def _pipeline_config(args, **overrides):
+    """Config entries for the options given on the command line"""
+    options = {
+        'data_path': args.data,
+        'hellwig_top_k': args.hellwig_top_k,
+        'compare_top_n': args.compare_top_n,
+        'max_lag': args.max_lag,
+        'lag_vars': args.lag_vars,
+        'selection_method': args.selection,
+        'stepwise_direction': args.stepwise_direction,
+        'stepwise_criterion': args.stepwise_criterion,
+        'bootstrap_reps': args.bootstrap_reps,
+        'compact_dtype': args.compact_dtype,
+        'data_cache': False if args.no_data_cache else None,
+        'report_path': args.report,
+        'trace_memory': args.trace_memory,
+        'plot_dpi': getattr(args, 'plot_dpi', None),
+        'plot_format': getattr(args, 'plot_format', None),
+    }
+    return {**{k: v for k, v in options.items() if v is not None}, **overrides}
+
+
+def command_run(args):
+    from Functions.instrumentation import console_to_log, logger
+
+    if args.incremental:
+        from Functions.incremental import run_incremental_update
+        from Functions.pipeline import DEFAULT_CONFIG
+        with console_to_log():
+            run_incremental_update(args.data or DEFAULT_CONFIG['data_path'])
+        return
+    if args.batch:
+        from Functions.batch import load_jobs, run_batch
+        table = run_batch(load_jobs(args.batch), max_workers=args.batch_workers)
+        table.to_csv(args.batch_output, index=False)
+        logger.info(table.to_string(index=False))
+        logger.info(f"\nBatch results written to {args.batch_output}")
+        return
+
+    from Functions.pipeline import run_pipeline
+    logger.info("=== ECONOMETRIC PROJECT ===\n")
+    config = _pipeline_config(args, plots=not args.no_plots, headless=args.headless)
+    run_pipeline(config, from_stage=args.from_stage, force=args.force)
+    logger.info("\n=== ANALYSIS COMPLETE ===")
+
+
+def command_predict(args):
+    import pandas as pd
+    from Functions.data_preparation import sanitize_columns
+    from Functions.instrumentation import logger
+    from Functions.model_artifact import load_model_artifact, predict_levels
+
+    artifact = load_model_artifact(args.model) if args.model else load_model_artifact()
+    reader = pd.read_csv if args.input.lower().endswith('.csv') else pd.read_excel
+    forecasts = predict_levels(artifact, sanitize_columns(reader(args.input)))
+    if args.output:
+        forecasts.to_csv(args.output)
+        logger.info(f"Forecasts written to {args.output}")
+    else:
+        logger.info(forecasts.to_string())
 
-    with np.errstate(divide='ignore', invalid='ignore'):
-        mape_values = np.abs((Y_test - predictions) / Y_test) * 100
-        mape_values = mape_values[np.isfinite(mape_values)]
-        mape = np.mean(mape_values) if len(mape_values) > 0 else np.nan
 
-        smape = np.mean(2 * np.abs(Y_test - predictions) / (np.abs(Y_test) + np.abs(predictions))) * 100
+def command_simulate(args):
+    import numpy as np
+    from Functions.instrumentation import logger
+    from Functions.model_artifact import load_model_artifact
+    from Functions.scenarios import SCENARIO_CHUNK_SIZE, simulate_scenarios
 
-    print(f"\n=== OUT-OF-SAMPLE RESULTS (Test Set) ===")
-    print(f"MAE = {mae:.6f}")
-    print(f"RMSE = {rmse:.6f}")
-    if not np.isnan(mape):
-        print(f"MAPE = {mape:.2f}%")
+    artifact = load_model_artifact(args.model) if args.model else load_model_artifact()
+    columns = None
+    if args.scenarios.lower().endswith('.npz'):
+        with np.load(args.scenarios) as arrays:
+            columns = list(arrays.files)
+            scenarios = np.stack([arrays[name] for name in columns], axis=-1)
     else:
-        print("MAPE = NaN (very small D_CLOSE values)")
-    print(f"sMAPE = {smape:.2f}%")
-
-    print("\nCreating actual vs predicted plot...")
-    plot_actual_vs_predicted(Y_test, predictions)
-
-    print("\n=== ANALYSIS COMPLETE ===")
+        scenarios = np.load(args.scenarios)
+
+    paths = simulate_scenarios(artifact, scenarios, columns, args.noise_draws, args.seed,
+                               args.chunk_size or SCENARIO_CHUNK_SIZE)
+    final_levels = paths[artifact.response][..., -1].ravel()
+    quantiles = np.nanpercentile(final_levels, [5, 25, 50, 75, 95])
+    logger.info(f"{len(scenarios)} scenarios x {scenarios.shape[1]} periods")
+    logger.info(f"{artifact.response} at the horizon: "
+                + ", ".join(f"p{q}={v:.4f}" for q, v in zip((5, 25, 50, 75, 95), quantiles)))
+    if args.output:
+        np.savez(args.output, **paths)
+        logger.info(f"Paths written to {args.output}")
+
+
+def command_diagnose(args):
+    from Functions.pipeline import run_pipeline
+    run_pipeline(_pipeline_config(args, plots=False), from_stage=args.from_stage, force=args.force,
+                 until='diagnostics')
+
+
+def command_report(args):
+    from Functions.candidate_report import diagnose_candidates, write_candidate_report
+    from Functions.instrumentation import logger
+    from Functions.pipeline import run_pipeline
+
+    artifacts = run_pipeline(_pipeline_config(args, plots=False), from_stage=args.from_stage, force=args.force,
+                             until='selection')
+    candidates = artifacts.get('hellwig_results') or artifacts['stepwise_results']
+    table = diagnose_candidates(artifacts['data_features'], candidates[:args.top_n], artifacts['response_var'],
+                                artifacts['data_test_features'], args.rank_by, args.workers)
+    markdown_path, csv_path = write_candidate_report(table, args.output, artifacts['response_var'])
+    logger.info(table[['rank', 'variables', 'tests_passed', args.rank_by]].to_string(index=False))
+    logger.info(f"\nReport written to {markdown_path} and {csv_path}")
+
+
+def command_plot(args):
+    from Functions.pipeline import run_pipeline
+    run_pipeline(_pipeline_config(args, plots=True, headless=True), from_stage=args.from_stage, force=args.force)
+
+
+COMMAND_HANDLERS = {
+    'run': command_run,
+    'predict': command_predict,
+    'simulate': command_simulate,
+    'diagnose': command_diagnose,
+    'report': command_report,
+    'plot': command_plot,
+}
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    from Functions.instrumentation import configure_logging
+    configure_logging(args.log_level)
+    COMMAND_HANDLERS[args.command](args)
 
 
 if __name__ == "__main__":